@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+"""
+Load test of the remote control server.
+
+Runs RemoteCtrlServer in process against stand-in FreeCAD and FreeCADGui
+modules (benchmarks/standin) exposing synthetic workbenches, toolbars and
+macros, and drives it with simulated clients doing page loads, icon fetches
+and action posts. Reports throughput, latency percentiles per route and the
+time actions wait for the Gui thread. Requires PySide6 or PySide2.
+
+    python benchmarks/remote_server.py --clients 16 --duration 10
+"""
+
+import argparse, http.client, json, os, random, sys, threading, time
+from collections import defaultdict
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path[:0] = [str(HERE.joinpath('standin')), str(HERE.parent)]
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# Scenario weights of the simulated clients
+SCENARIOS = {
+    'page': 30,
+    'icons': 15,
+    'icon-file': 20,
+    'action': 20,
+    'workbench': 5,
+    'macro': 10,
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8, help="simulated clients")
+    parser.add_argument('--duration', type=float, default=10, help="seconds of load")
+    parser.add_argument('--workers', type=int, default=8, help="server worker threads")
+    parser.add_argument('--workbenches', type=int, default=10)
+    parser.add_argument('--toolbars', type=int, default=4, help="toolbars per workbench")
+    parser.add_argument('--actions', type=int, default=12, help="actions per toolbar")
+    parser.add_argument('--macros', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="also write the results to this file")
+    return parser.parse_args()
+
+
+class Workbench:
+
+    def __init__(self, name, toolbars):
+        self.MenuText = name
+        self.Icon = ''
+        self.toolbars = toolbars
+
+    def listToolbars(self):
+        return self.toolbars
+
+
+def make_workbenches(Gui, QtGui, mw, count, toolbars, actions):
+    for w in range(count):
+        names = []
+        for t in range(toolbars):
+            name = 'WB{}_TB{}'.format(w, t)
+            toolbar = QtGui.QToolBar(name, mw)
+            toolbar.setObjectName(name)
+            mw.addToolBar(toolbar)
+            for a in range(actions):
+                pixmap = QtGui.QPixmap(32, 32)
+                pixmap.fill(QtGui.QColor((w * 23) % 256, (t * 61) % 256, (a * 17) % 256))
+                action = QtGui.QAction(QtGui.QIcon(pixmap), 'Action {} {}'.format(t, a), mw)
+                action.setObjectName('Bench_{}_{}'.format(name, a))
+                toolbar.addAction(action)
+            names.append(name)
+        Gui.workbenches['Bench{}Workbench'.format(w)] = Workbench('Bench {}'.format(w), names)
+
+
+def make_macros(root, count):
+    root.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        root.joinpath('BenchMacro{}.FCMacro'.format(i)).write_text(
+            "__Name__ = 'Bench Macro {0}'\nvalue = sum(range({0}))\n".format(i))
+
+
+def percentile(samples, p):
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+
+class Targets:
+    """Urls discovered from the pages, used by the clients"""
+
+    def __init__(self):
+        self.pages = []
+        self.icons = []
+        self.actions = []
+        self.workbenches = []
+        self.macros = []
+
+
+def discover(port):
+    targets = Targets()
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def get(path):
+        conn.request('GET', path)
+        return json.loads(conn.getresponse().read())
+
+    workbenches = get('/workbenches')
+    targets.pages.append('/workbenches')
+    for action in workbenches['sections'][0]['actions']:
+        name = action['action'].rsplit('/', 1)[1]
+        targets.workbenches.append(action['action'])
+        targets.pages.append('/workbench-actions/' + name)
+    targets.pages.append('/macros')
+    for path in targets.pages[1:]:
+        for section in get(path)['sections']:
+            for action in section['actions']:
+                if action['action'].startswith('/macro/'):
+                    targets.macros.append(action['action'])
+                elif action['action'].startswith('/action/'):
+                    targets.actions.append(action['action'])
+                if action['icon'].startswith('/'):
+                    targets.icons.append(action['icon'])
+    conn.close()
+    return targets
+
+
+class Client(threading.Thread):
+
+    def __init__(self, port, targets, deadline, seed):
+        super(Client, self).__init__(daemon=True)
+        self.port = port
+        self.targets = targets
+        self.deadline = deadline
+        self.random = random.Random(seed)
+        self.samples = []  # (route, seconds, status)
+        self.conn = None
+
+    def request(self, scenario):
+        t = self.targets
+        choice = self.random.choice
+        if scenario == 'page':
+            return 'GET', choice(t.pages)
+        if scenario == 'icons':
+            return 'GET', '/icons' + choice(t.pages)
+        if scenario == 'icon-file':
+            return 'GET', choice(t.icons)
+        if scenario == 'action':
+            return 'POST', choice(t.actions)
+        if scenario == 'workbench':
+            return 'POST', choice(t.workbenches)
+        return 'POST', choice(t.macros)
+
+    def run(self):
+        scenarios = list(SCENARIOS)
+        weights = [SCENARIOS[s] for s in scenarios]
+        while time.monotonic() < self.deadline:
+            scenario = self.random.choices(scenarios, weights)[0]
+            method, path = self.request(scenario)
+            if not self.conn:
+                self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            start = time.perf_counter()
+            try:
+                self.conn.request(method, path, headers={'Accept-Encoding': 'gzip'})
+                response = self.conn.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.conn.close()
+                    self.conn = None
+            except (OSError, http.client.HTTPException):
+                status = 'error'
+                self.conn.close()
+                self.conn = None
+            self.samples.append((scenario, time.perf_counter() - start, status))
+        if self.conn:
+            self.conn.close()
+
+
+def report(clients, elapsed, queue_stats, hits):
+    by_route = defaultdict(list)
+    errors = defaultdict(lambda: defaultdict(int))
+    for client in clients:
+        for route, seconds, status in client.samples:
+            by_route[route].append(seconds)
+            if status != 200:
+                errors[route][str(status)] += 1
+    routes = {}
+    for route in sorted(by_route):
+        samples = sorted(by_route[route])
+        routes[route] = {
+            'count': len(samples),
+            'rps': round(len(samples) / elapsed, 1),
+            'p50_ms': round(percentile(samples, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(samples, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(samples, 0.99) * 1000, 2),
+            'errors': dict(errors[route]),
+        }
+    total = sum(r['count'] for r in routes.values())
+    return {
+        'clients': len(clients),
+        'seconds': round(elapsed, 2),
+        'requests': total,
+        'rps': round(total / elapsed, 1),
+        'routes': routes,
+        'gui': queue_stats,
+        'hits': hits,
+    }
+
+
+def print_report(result):
+    print("{} clients, {} requests in {}s: {} req/s".format(
+        result['clients'], result['requests'], result['seconds'], result['rps']))
+    print()
+    print("{:<12}{:>8}{:>9}{:>10}{:>10}{:>10}  errors".format('route', 'count', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for route, r in result['routes'].items():
+        print("{:<12}{:>8}{:>9}{:>10}{:>10}{:>10}  {}".format(
+            route, r['count'], r['rps'], r['p50_ms'], r['p95_ms'], r['p99_ms'], r['errors'] or ''))
+    gui = result['gui']
+    print()
+    print("Gui thread: {} executed, {} coalesced, {} rejected".format(gui['executed'], gui['coalesced'], gui['rejected']))
+    print("  wait ms: {}".format(gui['wait_ms']))
+    print("  run ms:  {}".format(gui['run_ms']))
+
+
+def shutdown(httpd):
+    """Stop the server threads and drop the server Qt objects"""
+    from freecad.mnesarco.remote import server
+    httpd.shutdown()
+    httpd.server_close()
+    httpd.pool.shutdown(wait=True)
+    for thread in (httpd.idle, httpd.streamer, httpd.view_streamer.thread):
+        if thread and thread.is_alive():
+            thread.join(timeout=2)
+    server.camera_input.timer.stop()
+    server.camera_input.deleteLater()
+    server.gui_queue.signal.deleteLater()
+
+
+def main():
+    args = parse_args()
+    import FreeCAD as App
+    import FreeCADGui as Gui
+    from PySide import QtCore, QtGui
+
+    app = QtGui.QApplication([])
+    Gui.main_window = QtGui.QMainWindow()
+    make_workbenches(Gui, QtGui, Gui.main_window, args.workbenches, args.toolbars, args.actions)
+    make_macros(Path(App.getUserMacroDir()), args.macros)
+
+    from freecad.mnesarco.remote import server
+    # Keep every sample of the run, not only the recent ones
+    server.gui_queue.reset_stats(samples=None)
+
+    httpd = server.RemoteCtrlServer(server.DOCROOT, ('127.0.0.1', 0), workers=args.workers)
+    port = httpd.server_address[1]
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    result = {}
+
+    def drive():
+        try:
+            targets = discover(port)
+            start = time.monotonic()
+            deadline = start + args.duration
+            clients = [Client(port, targets, deadline, args.seed + i) for i in range(args.clients)]
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            elapsed = time.monotonic() - start
+            result.update(report(clients, elapsed, server.gui_queue.stats(), server.router.stats()))
+        finally:
+            result['done'] = True
+
+    threading.Thread(target=drive, daemon=True).start()
+    def check_done():
+        if result.get('done'):
+            app.quit()
+
+    timer = QtCore.QTimer()
+    timer.timeout.connect(check_done)
+    timer.start(50)
+    (getattr(app, 'exec', None) or app.exec_)()
+    timer.stop()
+    shutdown(httpd)
+    Gui.main_window.deleteLater()
+    Gui.main_window = None
+    QtCore.QCoreApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+    del timer, app
+
+    if 'requests' not in result:
+        print("Benchmark failed", file=sys.stderr)
+        return 1
+    print_report(result)
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    status = main()
+    # Everything is shut down at this point. Skip the interpreter teardown:
+    # some PySide6 releases (6.12 on Python < 3.12) over-release bool in
+    # QAction.trigger and Signal.emit, and abort there with bool_dealloc.
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(status)
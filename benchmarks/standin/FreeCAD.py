@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# Minimal stand-in for the FreeCAD module, enough to run the remote server
+# outside of FreeCAD. Parameters live in memory, paths in a temp dir.
+#
+
+import os
+import tempfile
+
+GuiUp = True
+ActiveDocument = None
+ROOT = os.environ.get('MNESARCO_BENCH_ROOT', tempfile.mkdtemp(prefix='mnesarco-bench-'))
+
+
+class _Console:
+
+    def PrintMessage(self, msg):
+        pass
+
+    def PrintWarning(self, msg):
+        pass
+
+    def PrintError(self, msg):
+        print(msg, end='')
+
+
+Console = _Console()
+
+
+class _ParamGroup:
+
+    store = {}
+
+    def __init__(self, key):
+        self.values = _ParamGroup.store.setdefault(key, {})
+
+    def GetString(self, key, default=''):
+        return self.values.get(key, default)
+
+    def GetInt(self, key, default=0):
+        return self.values.get(key, default)
+
+    def GetBool(self, key, default=None):
+        return self.values.get(key, default)
+
+    def GetFloat(self, key, default=0.0):
+        return self.values.get(key, default)
+
+    def SetString(self, key, value):
+        self.values[key] = value
+
+    SetInt = SetBool = SetFloat = SetString
+
+    def GetStrings(self, key):
+        return []
+
+    def GetGroups(self):
+        return []
+
+    def GetContents(self):
+        return [('String', k, v) for k, v in self.values.items()]
+
+    def Clear(self):
+        self.values.clear()
+
+    def Attach(self, observer):
+        pass
+
+
+def ParamGet(key):
+    return _ParamGroup(key)
+
+
+def getUserMacroDir(flag=False):
+    return os.path.join(ROOT, 'macros')
+
+
+def getUserCachePath():
+    return os.path.join(ROOT, 'cache')
+
+
+def getUserAppDataDir():
+    return ROOT
+
+
+def addDocumentObserver(observer):
+    pass
+
+
+def removeDocumentObserver(observer):
+    pass
+
+
+def listDocuments():
+    return {}
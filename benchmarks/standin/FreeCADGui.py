@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+#
+# Minimal stand-in for the FreeCADGui module. The benchmark installs the
+# main window and the synthetic workbenches.
+#
+
+import time
+
+ActiveDocument = None
+workbenches = {}
+main_window = None
+
+# Simulated cost in seconds of a workbench activation
+ACTIVATION_COST = 0.002
+
+
+def listWorkbenches():
+    return workbenches
+
+
+def getMainWindow():
+    return main_window
+
+
+def activateWorkbench(name):
+    time.sleep(ACTIVATION_COST)
+
+
+def doCommandGui(code):
+    import __main__
+    exec(code, __main__.__dict__)
+
+
+def addLanguagePath(path):
+    pass
+
+
+def updateLocale():
+    pass
+
+
+class Selection:
+
+    @staticmethod
+    def addObserver(observer):
+        pass
+
+    @staticmethod
+    def removeObserver(observer):
+        pass
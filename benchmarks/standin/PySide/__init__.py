@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+#
+# Stand-in for the PySide compatibility module shipped with FreeCAD:
+# QtGui also exposes the QtWidgets classes.
+#
+
+import sys
+
+try:
+    from PySide6 import QtCore, QtGui as _QtGui, QtWidgets, QtSvg
+except ImportError:
+    from PySide2 import QtCore, QtGui as _QtGui, QtWidgets, QtSvg
+
+
+class _Merged:
+    pass
+
+
+QtGui = _Merged()
+for _module in (_QtGui, QtWidgets):
+    for _name in dir(_module):
+        if not _name.startswith('_'):
+            setattr(QtGui, _name, getattr(_module, _name))
+
+sys.modules['PySide.QtCore'] = QtCore
+sys.modules['PySide.QtGui'] = QtGui
+sys.modules['PySide.QtSvg'] = QtSvg
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+"""Stand-in for pivy, the remote server does not use Coin"""
+
+
+class coin:
+    pass
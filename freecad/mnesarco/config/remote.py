@@ -37,15 +37,27 @@ class RemoteConfig(QtCore.QObject):
         self.retranslateUi()
         self.refresh()
         self.form.port_input.textChanged.connect(self.changed)
+        self.form.workers_input.textChanged.connect(self.changed)
+        self.form.prewarm_input.stateChanged.connect(self.changed)
+        self.form.bytecode_input.stateChanged.connect(self.changed)
 
     def retranslateUi(self):
         self.title = tr("Remote")
         self.form.label_banner.setText(tr("Remote Control ({})".format(networking.get_local_ip())))
         self.form.label_port.setText(tr("Port number:"))       
+        self.form.label_workers.setText(tr("Worker threads:"))
+        self.form.label_prewarm.setText(tr("Prepare workbench pages on start:"))
+        self.form.label_bytecode.setText(tr("Cache compiled macros on disk:"))
 
     def refresh(self):
         port = str(pref.get_mnesarco_pref("Remote", "Port", default=8521))
         self.form.port_input.setText(port)
+        workers = str(pref.get_mnesarco_pref("Remote", "Workers", kind=int, default=8))
+        self.form.workers_input.setText(workers)
+        prewarm = pref.get_mnesarco_pref("Remote", "Prewarm", kind=bool, default=False)
+        self.form.prewarm_input.setChecked(bool(prewarm))
+        bytecode = pref.get_mnesarco_pref("Remote", "BytecodeCache", kind=bool, default=True)
+        self.form.bytecode_input.setChecked(bool(bytecode))
 
     def validate(self):
         messages = []
@@ -55,8 +67,14 @@ class RemoteConfig(QtCore.QObject):
         if not validation.validate_required(self.form.port_input.text(), messages):
             self.message = tr('Port number: {}').format(messages[0])
             return False
+        if not validation.validate_int(self.form.workers_input.text(), 2, 64, messages):
+            self.message = tr('Worker threads: {}').format(messages[0])
+            return False
         return True
 
     def save(self):
         pref.set_mnesarco_pref("Remote", "Port", int(self.form.port_input.text()))
+        pref.set_mnesarco_pref("Remote", "Workers", int(self.form.workers_input.text()))
+        pref.set_mnesarco_pref("Remote", "Prewarm", self.form.prewarm_input.isChecked())
+        pref.set_mnesarco_pref("Remote", "BytecodeCache", self.form.bytecode_input.isChecked())
 
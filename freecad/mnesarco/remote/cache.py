@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import gzip, hashlib, json, threading
+from freecad.mnesarco.utils.qt import QtCore
+from freecad.mnesarco.utils.timers import execute_later
+from freecad.mnesarco.utils.extension import log_err
+
+WATCH_INTERVAL = 2000
+
+
+class CachedPage:
+    """Pre-encoded json response"""
+
+    def __init__(self, data, version):
+        self.data = data
+        self.version = version
+        self.body = json.dumps(data).encode()
+        self.gzipped = gzip.compress(self.body, compresslevel=6)
+        self.etag = '"{}"'.format(hashlib.sha1(self.body).hexdigest())
+        self.stale = False
+        self.bundles = {}
+
+
+class Entry:
+
+    def __init__(self, build):
+        self.build = build
+        self.page = None
+
+
+class PageCache:
+    """
+    Encoded pages by key. Stale pages are still served until they are
+    rebuilt in the background, missing pages are built on demand.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.RLock()
+        self.version = 0
+        self.pending = False
+
+    def peek(self, key):
+        """Cached page or None, never builds"""
+        entry = self.entries.get(key, None)
+        return entry.page if entry else None
+
+    def get(self, key, build):
+        """Cached page, built if missing. Builds access Qt, call it from the Gui thread"""
+        entry = self.entries.get(key, None)
+        if entry and entry.page:
+            return entry.page
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if not entry:
+                entry = Entry(build)
+                self.entries[key] = entry
+            if not entry.page:
+                self.rebuild(entry)
+            return entry.page
+
+    def put(self, key, data, build):
+        """Store an already built page"""
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if not entry:
+                entry = Entry(build)
+                self.entries[key] = entry
+            self.version += 1
+            entry.page = CachedPage(data, self.version)
+            return entry.page
+
+    def rebuild(self, entry):
+        self.version += 1
+        entry.page = CachedPage(entry.build().data(), self.version)
+
+    def invalidate(self, accept=None):
+        """Mark pages stale and schedule a background rebuild"""
+        found = False
+        for key, entry in list(self.entries.items()):
+            if entry.page and (accept is None or accept(key)):
+                entry.page.stale = True
+                found = True
+        if found and not self.pending:
+            self.pending = True
+            execute_later(self.refresh, 10)
+
+    def refresh(self):
+        """Rebuild one stale page per event loop iteration (Gui thread)"""
+        stale = [e for e in list(self.entries.values()) if e.page and e.page.stale]
+        if not stale:
+            self.pending = False
+            return
+        if self.lock.acquire(blocking=False):
+            try:
+                self.rebuild(stale[0])
+            except BaseException as ex:
+                log_err("Remote page rebuild failed:", ex)
+                stale[0].page = None
+            finally:
+                self.lock.release()
+        execute_later(self.refresh, 10)
+
+
+class CacheWatcher(QtCore.QObject):
+    """
+    Periodically computes cheap signatures of the sources of the pages
+    and invalidates the affected pages when they change.
+    """
+
+    def __init__(self, cache, *args, **kwargs):
+        super(CacheWatcher, self).__init__(*args, **kwargs)
+        self.cache = cache
+        self.rules = []
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.check)
+
+    def watch(self, signature, accept):
+        """Invalidate pages whose key is accepted when signature() changes"""
+        self.rules.append([signature, accept, self.safe_signature(signature)])
+
+    def safe_signature(self, signature):
+        try:
+            return signature()
+        except BaseException:
+            return None
+
+    def check(self):
+        for rule in self.rules:
+            current = self.safe_signature(rule[0])
+            if current != rule[2]:
+                rule[2] = current
+                self.cache.invalidate(rule[1])
+
+    def start(self, interval=WATCH_INTERVAL):
+        self.timer.start(interval)
+
+    def stop(self):
+        self.timer.stop()
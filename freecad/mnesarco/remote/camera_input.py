@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import threading
+from freecad.mnesarco.utils import qt
+from freecad.mnesarco.utils.qt import QtCore
+
+# Milliseconds between camera updates, one display frame
+FRAME_INTERVAL = 16
+
+# Zoom steps applied in a single frame, the rest waits for the next ones
+MAX_ZOOM_STEPS = 5
+
+
+class Pending:
+
+    def __init__(self):
+        self.rotate = [0.0, 0.0, 0.0]
+        self.pan = [0.0, 0.0]
+        self.zoom = 0
+        self.center = False
+        self.inputs = 0
+
+
+class CameraInput(QtCore.QObject):
+    """
+    Accumulates camera deltas from any thread and applies them in the Gui
+    thread at most once per frame, however fast the input arrives.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CameraInput, self).__init__(*args, **kwargs)
+        self.pending = Pending()
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.signal = qt.SignalObject(self)
+        self.signal.forward(self.schedule)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(FRAME_INTERVAL)
+        self.timer.timeout.connect(self.apply)
+        self.camera = None
+        self.axis = None
+        self.angle = 0.0
+        self.inputs = 0
+        self.frames = 0
+
+    def add(self, rotate=None, pan=None, zoom=0, center=False):
+        """Thread safe"""
+        with self.lock:
+            p = self.pending
+            for i, value in enumerate((rotate or ())[:3]):
+                p.rotate[i] += value
+            for i, value in enumerate((pan or ())[:2]):
+                p.pan[i] += value
+            p.zoom += zoom
+            p.center = p.center or center
+            p.inputs += 1
+            schedule = not self.scheduled
+            self.scheduled = True
+        if schedule:
+            self.signal.trigger()
+
+    def schedule(self, *args):
+        """Gui thread"""
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def apply(self):
+        """Gui thread, once per frame"""
+        from freecad.mnesarco.utils.graphics import get_camera
+        with self.lock:
+            p, self.pending = self.pending, Pending()
+            self.scheduled = False
+        self.inputs += p.inputs
+        self.frames += 1
+        camera = get_camera()
+        if not camera:
+            return
+        if camera is not self.camera:
+            self.camera, self.axis = camera, None
+        for axis, delta in enumerate(p.rotate):
+            if delta:
+                # Camera.rotate takes the angle since the last change of axis
+                if axis != self.axis:
+                    self.axis, self.angle = axis, 0.0
+                self.angle += delta
+                camera.rotate(axis, self.angle)
+        for axis, delta in enumerate(p.pan):
+            if delta:
+                camera.pan(axis, delta)
+        steps = max(-MAX_ZOOM_STEPS, min(MAX_ZOOM_STEPS, p.zoom))
+        for _ in range(abs(steps)):
+            if steps > 0:
+                camera.zoom_in()
+            else:
+                camera.zoom_out()
+        if steps != p.zoom:
+            # Fast pinches: apply the rest in the next frames
+            with self.lock:
+                self.pending.zoom += p.zoom - steps
+                schedule = not self.scheduled
+                self.scheduled = True
+            if schedule:
+                self.timer.start()
+        if p.center:
+            camera.center_on_selection()
+
+    def stats(self):
+        return {'inputs': self.inputs, 'frames': self.frames}
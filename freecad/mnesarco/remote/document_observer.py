@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import threading
+from collections import OrderedDict
+from freecad.mnesarco.remote.events import event_bus
+
+# Objects tracked, the least recently changed are forgotten
+CHANGES_CAPACITY = 8192
+
+CREATED = 'created'
+CHANGED = 'changed'
+DELETED = 'deleted'
+
+
+class ObjectState:
+
+    __slots__ = ('rev', 'created_rev', 'new_rev', 'deleted')
+
+    def __init__(self):
+        self.rev = 0
+        self.created_rev = 0
+        self.new_rev = 0  # rev of the creation if it was the first record
+        self.deleted = False
+
+
+class ChangeLog:
+    """
+    Last change of every object, ordered by revision, so repeated changes of
+    the same object (i.e. all its properties in a recompute) take a single
+    entry. Revisions of forgotten objects are lost, clients must reload then.
+    """
+
+    def __init__(self, capacity=CHANGES_CAPACITY):
+        self.capacity = capacity
+        self.objects = OrderedDict()  # (document, name) -> ObjectState
+        self.rev = 0
+        self.forgotten_rev = 0
+        self.document = None
+        self.document_rev = 0
+        self.lock = threading.Lock()
+
+    def record(self, document, name, kind):
+        with self.lock:
+            self.rev += 1
+            key = (document, name)
+            state = self.objects.pop(key, None)
+            if state is None:
+                state = ObjectState()
+                if kind == CREATED:
+                    state.new_rev = self.rev
+            state.rev = self.rev
+            if kind == CREATED:
+                state.created_rev = self.rev
+            state.deleted = kind == DELETED
+            self.objects[key] = state
+            while len(self.objects) > self.capacity:
+                _, oldest = self.objects.popitem(last=False)
+                self.forgotten_rev = oldest.rev
+
+    def activate(self, document):
+        """The active document changed, older revisions are not valid for it"""
+        with self.lock:
+            if document != self.document:
+                self.rev += 1
+                self.document = document
+                self.document_rev = self.rev
+
+    def changes(self, document, since):
+        """
+        Object changes of document after since, collapsed per object.
+
+        :return: (rev, {name: kind}) or (rev, None) if since is too old.
+        """
+        with self.lock:
+            if since > self.rev or since < self.document_rev or since < self.forgotten_rev:
+                return self.rev, None
+            result = {}
+            for (doc, name), state in reversed(self.objects.items()):
+                if state.rev <= since:
+                    break
+                if doc != document:
+                    continue
+                if state.deleted:
+                    # Unknown to the client if it first appeared after since
+                    if state.new_rev <= since:
+                        result[name] = DELETED
+                elif state.created_rev > since:
+                    result[name] = CREATED
+                else:
+                    result[name] = CHANGED
+            return self.rev, result
+
+
+class DocumentObserver:
+    """Publishes document events for remote clients and records object changes"""
+
+    def __init__(self):
+        self.changes = ChangeLog()
+
+    def slotCreatedObject(self, obj):
+        self.changes.record(obj.Document.Name, obj.Name, CREATED)
+
+    def slotDeletedObject(self, obj):
+        self.changes.record(obj.Document.Name, obj.Name, DELETED)
+
+    def slotChangedObject(self, obj, prop):
+        self.changes.record(obj.Document.Name, obj.Name, CHANGED)
+
+    def slotActivateDocument(self, doc):
+        self.changes.activate(doc.Name)
+
+    def slotDeletedDocument(self, doc):
+        self.changes.activate(None)
+
+    def slotRecomputedDocument(self, doc):
+        event_bus.publish('recomputed', document=doc.Name)
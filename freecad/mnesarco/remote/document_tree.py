@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+from freecad.mnesarco import App
+
+# Only cheap properties are listed, shapes and meshes are never serialized
+SIMPLE_PROPERTIES = (
+    'App::PropertyBool', 'App::PropertyInteger', 'App::PropertyFloat', 'App::PropertyPercent',
+    'App::PropertyQuantity', 'App::PropertyLength', 'App::PropertyDistance', 'App::PropertyAngle',
+    'App::PropertyString', 'App::PropertyEnumeration', 'App::PropertyVector', 'App::PropertyPlacement',
+    'App::PropertyLink', 'App::PropertyColor',
+)
+
+
+def is_simple_property(type_id):
+    if type_id == 'App::PropertyLinkList':
+        return True
+    return type_id.startswith(SIMPLE_PROPERTIES) and not type_id.endswith('List')
+
+
+def property_value(value):
+    """Json friendly value, or None if it cannot be represented cheaply"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [property_value(v) for v in value]
+    if isinstance(value, App.Vector):
+        return [value.x, value.y, value.z]
+    if isinstance(value, App.Placement):
+        return {'base': property_value(value.Base), 'rotation': list(value.Rotation.Q)}
+    if hasattr(value, 'TypeId') and hasattr(value, 'Name'):
+        return value.Name
+    if hasattr(value, 'Value') and hasattr(value, 'Unit'):
+        return value.Value
+    return None
+
+
+def object_data(obj):
+    """Gui thread"""
+    properties = {}
+    for prop in obj.PropertiesList:
+        try:
+            if is_simple_property(obj.getTypeIdOfProperty(prop)):
+                properties[prop] = property_value(getattr(obj, prop))
+        except BaseException:
+            pass
+    children = obj.OutList
+    vo = getattr(obj, 'ViewObject', None)
+    if vo and hasattr(vo, 'claimChildren'):
+        try:
+            children = vo.claimChildren()
+        except BaseException:
+            pass
+    return {
+        'name': obj.Name,
+        'label': obj.Label,
+        'type': obj.TypeId,
+        'visible': bool(vo.Visibility) if vo else None,
+        'children': [child.Name for child in children if hasattr(child, 'Name')],
+        'properties': properties,
+    }
+
+
+def document_tree(doc):
+    """Gui thread"""
+    return [object_data(obj) for obj in doc.Objects]
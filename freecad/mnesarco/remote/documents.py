@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import os
+from pathlib import Path
+from freecad.mnesarco.utils import preferences
+from freecad.mnesarco.remote import page
+from freecad.mnesarco.resources import tr
+from freecad.mnesarco.remote.exports import export_file, export_document
+from freecad.mnesarco.remote.thumbnails import thumbnail_cache
+
+MAX_RECENT_FILES = 50
+
+
+def recent_files():
+    """Paths of the FreeCAD recent files list, most recent first"""
+    files = []
+    for i in range(MAX_RECENT_FILES):
+        path = preferences.get_user_pref('Preferences', 'RecentFiles', 'MRU{}'.format(i))
+        if not path:
+            break
+        files.append(path)
+    return files
+
+
+def recent_files_signature():
+    """Recent files and their modification times, thumbnails change on save"""
+    signature = []
+    for path in recent_files():
+        try:
+            signature.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            signature.append((path, None))
+    return signature
+
+
+class RecentDocumentsPage(page.Page):
+
+    def title(self):
+        return tr("Recent Documents")
+
+    def sections(self):
+        actions = []
+        for path in recent_files():
+            path = Path(path)
+            if not path.exists():
+                continue
+            thumbnail = thumbnail_cache.get(path)
+            icon = export_file(thumbnail) if thumbnail else "img/freecad.svg"
+            actions.append(page.Action(path.stem, icon, '/open-document/{}'.format(export_document(path))))
+        return [page.Section(tr("Recent"), actions)]
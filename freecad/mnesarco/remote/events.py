@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import threading
+from collections import deque
+
+EVENTS_CAPACITY = 256
+
+
+class EventBus:
+    """
+    Sequenced events for remote clients. The last events are kept in a ring
+    buffer, so a client can ask for everything after the last seq it saw.
+    """
+
+    def __init__(self, capacity=EVENTS_CAPACITY):
+        self.events = deque(maxlen=capacity)
+        self.seq = 0
+        self.cond = threading.Condition()
+
+    def publish(self, kind, **data):
+        """Thread safe, usually called from the Gui thread"""
+        with self.cond:
+            self.seq += 1
+            data['type'] = kind
+            data['seq'] = self.seq
+            self.events.append(data)
+            self.cond.notify_all()
+
+    def since(self, seq, timeout=0):
+        """
+        Events after seq, waiting up to timeout seconds for new ones.
+
+        :return: (events, last seq, reset) where reset means that some events
+            were lost and the client must reload its state.
+        """
+        with self.cond:
+            if seq < 0:
+                return [], self.seq, False
+            if timeout and seq == self.seq:
+                self.cond.wait_for(lambda: self.seq > seq, timeout)
+            if seq > self.seq:
+                return [], self.seq, True
+            events = [e for e in self.events if e['seq'] > seq]
+            reset = seq < self.seq and (not events or events[0]['seq'] > seq + 1)
+            return events, self.seq, reset
+
+
+event_bus = EventBus()
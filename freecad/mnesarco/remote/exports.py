@@ -18,71 +18,210 @@
 # along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
 # 
 
-import hashlib
+import hashlib, os, threading, weakref
+from collections import OrderedDict
 from pathlib import Path
 
-# Mapping from hashes to file paths
-allowed_files = {}
 
-# Mapping from hashes to macro file path
-macro_files = {}
+def make_key(source):
+    return hashlib.blake2b(repr(source).encode(), digest_size=16).hexdigest()
+
+
+class Registry:
+    """
+    Bounded mapping of exported keys to values.
+
+    Keys are derived from a stable source (a name or a path) so they survive
+    restarts, and are memoized so hashing happens only once per source. When
+    the capacity is exceeded the least recently used entries are evicted.
+    """
+
+    def __init__(self, name, capacity):
+        self.name = name
+        self.capacity = capacity
+        self.entries = OrderedDict()  # key -> (source, value)
+        self.keys = {}  # source -> key
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, source, value, prefix=''):
+        with self.lock:
+            key = self.keys.get(source, None)
+            if key is None:
+                key = prefix + make_key(source)
+                self.keys[source] = key
+            self.entries[key] = (source, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+            return key
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def remove(self, key):
+        """Must be called with the lock held"""
+        source, _ = self.entries.pop(key)
+        self.keys.pop(source, None)
+
+    def discard(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class ActionRef:
+    """
+    Weak reference to a toolbar QAction. If the action was destroyed (i.e.
+    the workbench was reloaded) it is looked up again by toolbar and name.
+    """
+
+    def __init__(self, toolbar, action):
+        self.toolbar = toolbar
+        self.name = action.objectName()
+        self.ref = weakref.ref(action)
+
+    def resolve(self):
+        from freecad.mnesarco.utils import qt
+        action = self.ref()
+        if action is not None and qt.is_alive(action):
+            return action
+        from freecad.mnesarco.gui import Gui
+        for toolbar in Gui.getMainWindow().findChildren(qt.QtGui.QToolBar, self.toolbar):
+            for action in toolbar.actions():
+                if action.objectName() == self.name:
+                    self.ref = weakref.ref(action)
+                    return action
+        return None
+
+
+# Mapping from keys to file paths
+allowed_files = Registry('files', 4096)
+
+# Mapping from keys to macro file path
+macro_files = Registry('macros', 2048)
+
+# Mapping from keys to Workbench names
+workbench_keys = Registry('workbenches', 256)
+
+# Mapping from keys to toolbar names
+toolbar_keys = Registry('toolbars', 1024)
+
+# Mapping from keys to weak action references
+action_keys = Registry('actions', 8192)
+
+# Mapping from keys to document file paths
+document_files = Registry('documents', 256)
 
-# Mapping from hashes to Workbench names
-workbench_keys = {}
 
-# Mapping from hashes to toolbar names
-toolbar_keys = {}
+def export_file(path):
+    """
+    Export a file under a key that changes when the file changes,
+    so clients can cache it forever.
+    """
+    path = str(path)
+    try:
+        st = os.stat(path)
+        source = (path, st.st_mtime_ns, st.st_size)
+    except (OSError, ValueError):
+        source = (path, None, None)
+    return allowed_files.put(source, path, prefix='/')
 
-# Mapping from hashes to action names
-action_keys = {}
 
-def export_file(path):
-    key = '/' + hashlib.sha256(str(path).encode()).hexdigest()
-    allowed_files[key] = str(path)
-    return key
+def exported_paths():
+    """Paths of the exported files, clients may still request them"""
+    with allowed_files.lock:
+        return {value for _, value in allowed_files.entries.values()}
 
 
 def export_macro(macro):
-    macro_files[macro.key] = macro.file
-    return macro.key
+    return macro_files.put(str(macro.file), str(macro.file))
+
+
+def get_macro_key(path):
+    return make_key(str(path))
 
 
 def export_workbench(wb):
-    key = hashlib.sha256(str(wb.key).encode()).hexdigest()
-    workbench_keys[key] = wb.key
-    return key
+    return workbench_keys.put(wb.key, wb.key)
 
 
 def export_toolbar(toolbar):
-    key = hashlib.sha256(str(toolbar).encode()).hexdigest()
-    toolbar_keys[key] = toolbar
-    return key
+    return toolbar_keys.put(toolbar, toolbar)
 
 
 def export_action(toolbar, action):
-    key = hashlib.sha256(str(toolbar + "." + action.objectName()).encode()).hexdigest()
-    action_keys[key] = action
-    return key
+    return action_keys.put((toolbar, action.objectName()), ActionRef(toolbar, action))
 
 
 def get_exported_action(key):
-    return action_keys.get(key, None)
+    ref = action_keys.get(key)
+    if ref is None:
+        return None
+    action = ref.resolve()
+    if action is None:
+        action_keys.discard(key)
+    return action
+
+
+def get_exported_action_name(key):
+    """Command name of the action, without touching Qt"""
+    ref = action_keys.get(key)
+    return ref.name if ref else None
 
 
 def get_exported_file(key):
-    return allowed_files.get(key, key)
+    return allowed_files.get(key)
 
 
 def get_exported_wb(key):
-    return workbench_keys.get(key, None)
+    return workbench_keys.get(key)
 
 
 def get_exported_toolbar(key):
-    return toolbar_keys.get(key, None)
+    return toolbar_keys.get(key)
+
+
+def remove_exported_macro(path):
+    macro_files.discard(get_macro_key(path))
 
 
 def get_exported_macro(key):
-    path = macro_files.get(key, None)
+    path = macro_files.get(key)
     if path and Path(path).exists():
         return path
 
+
+def export_document(path):
+    return document_files.put(str(path), str(path))
+
+
+def get_exported_document(key):
+    path = document_files.get(key)
+    if path and Path(path).exists():
+        return path
+
+
+def stats():
+    registries = (allowed_files, macro_files, workbench_keys, toolbar_keys, action_keys, document_files)
+    return {r.name: r.stats() for r in registries}
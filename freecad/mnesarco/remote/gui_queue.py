@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import heapq, itertools, threading, time
+from collections import deque
+from concurrent.futures import Future
+from freecad.mnesarco.utils import qt
+
+PRIORITY_VIEW = 0
+PRIORITY_NORMAL = 1
+PRIORITY_SLOW = 2
+
+# Max pending requests by priority
+QUEUE_DEPTH = {
+    PRIORITY_VIEW: 16,
+    PRIORITY_NORMAL: 8,
+    PRIORITY_SLOW: 4,
+}
+
+# Max time in seconds for a single drain, the rest waits for the next loop
+DRAIN_BUDGET = 0.05
+
+# Recent items used for wait and run time stats
+TIME_SAMPLES = 1024
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Item:
+
+    def __init__(self, key, fn, priority):
+        self.key = key
+        self.fn = fn
+        self.priority = priority
+        self.future = Future()
+        self.waiters = 1
+        self.released = False
+        self.submitted = time.perf_counter()
+
+
+class GuiQueue:
+    """
+    Queue of work for the Gui thread. Pending items with the same key are
+    coalesced and share a single result. Items are run by priority, then in
+    arrival order, in batches that do not block the event loop for more than
+    DRAIN_BUDGET. Submitting to a full priority class raises QueueFullError.
+    """
+
+    def __init__(self, parent=None):
+        self.heap = []
+        self.pending = {}  # key -> Item
+        self.depth = {p: 0 for p in QUEUE_DEPTH}
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.signal = qt.SignalObject(parent)
+        # Always through the event loop, also when triggered from the Gui thread
+        self.signal.activate.connect(self.drain, qt.Qt.QueuedConnection)
+        self.executed = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.times = deque(maxlen=TIME_SAMPLES)  # (wait, run) seconds
+
+    def submit(self, fn, priority=PRIORITY_NORMAL, key=None):
+        """Thread safe, returns a Future. Use release(future) to give up waiting."""
+        with self.lock:
+            item = self.pending.get(key, None) if key is not None else None
+            if item and not item.future.done():
+                item.waiters += 1
+                self.coalesced += 1
+                return item.future
+            if self.depth[priority] >= QUEUE_DEPTH[priority]:
+                self.rejected += 1
+                raise QueueFullError()
+            item = Item(key, fn, priority)
+            if key is not None:
+                self.pending[key] = item
+            self.depth[priority] += 1
+            heapq.heappush(self.heap, (priority, next(self.counter), item))
+            schedule = not self.scheduled
+            self.scheduled = True
+        if schedule:
+            self.signal.trigger()
+        return item.future
+
+    def release(self, future):
+        """A waiter gave up, cancel the item if nobody else is waiting"""
+        with self.lock:
+            for _, _, item in self.heap:
+                if item.future is future:
+                    item.waiters -= 1
+                    if item.waiters <= 0 and future.cancel():
+                        # Stays in the heap until drained, but does not count as pending
+                        item.released = True
+                        self.depth[item.priority] -= 1
+                        if item.key is not None and self.pending.get(item.key, None) is item:
+                            del self.pending[item.key]
+                    return
+
+    def pop(self):
+        with self.lock:
+            if not self.heap:
+                self.scheduled = False
+                return None
+            _, _, item = heapq.heappop(self.heap)
+            if not item.released:
+                self.depth[item.priority] -= 1
+            if item.key is not None and self.pending.get(item.key, None) is item:
+                del self.pending[item.key]
+            return item
+
+    def drain(self, *args):
+        """Gui thread"""
+        deadline = time.perf_counter() + DRAIN_BUDGET
+        while time.perf_counter() < deadline:
+            item = self.pop()
+            if item is None:
+                return
+            if not item.future.set_running_or_notify_cancel():
+                continue
+            start = time.perf_counter()
+            try:
+                item.future.set_result(item.fn())
+            except BaseException as ex:
+                item.future.set_exception(ex)
+            self.times.append((start - item.submitted, time.perf_counter() - start))
+            self.executed += 1
+        # Let the event loop breathe, continue in the next iteration
+        self.signal.trigger()
+
+    def reset_stats(self, samples=TIME_SAMPLES):
+        """Clear the counters and keep up to samples timings, None keeps all"""
+        with self.lock:
+            self.executed = 0
+            self.coalesced = 0
+            self.rejected = 0
+            self.times = deque(maxlen=samples)
+
+    def stats(self):
+        with self.lock:
+            times = list(self.times)
+            return {
+                'pending': len(self.heap),
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'rejected': self.rejected,
+                'wait_ms': time_stats([t[0] for t in times]),
+                'run_ms': time_stats([t[1] for t in times]),
+            }
+
+
+def time_stats(samples):
+    """p50, p95 and max in milliseconds of samples in seconds"""
+    if not samples:
+        return None
+    samples = sorted(samples)
+
+    def ms(p):
+        return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 3)
+
+    return {'p50': ms(0.50), 'p95': ms(0.95), 'max': ms(1.0)}
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+#
+# This file is part of Mnesarco Utils.
+#
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import selectors, socket, threading, time
+
+
+class IdleConnections(threading.Thread):
+    """
+    Keep-alive connections waiting for their next request. They are watched
+    from a single thread instead of holding a worker each, and handed back
+    to the pool with `resume(handler)` when the client sends data. Connections
+    idle for more than `timeout` seconds are closed with `expire(handler)`.
+    """
+
+    def __init__(self, resume, expire, timeout):
+        super(IdleConnections, self).__init__(name='RemoteIdle', daemon=True)
+        self.resume = resume
+        self.expire = expire
+        self.timeout = timeout
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.handlers = {}  # handler -> deadline
+        self.running = True
+        self.waker, self.wake_signal = socket.socketpair()
+        self.waker.setblocking(False)
+        self.selector.register(self.waker, selectors.EVENT_READ, None)
+        self.parked = 0
+        self.resumed = 0
+        self.expired = 0
+
+    def park(self, handler):
+        with self.lock:
+            if not self.running:
+                self.expire(handler)
+                return
+            self.handlers[handler] = time.monotonic() + self.timeout
+            self.selector.register(handler.connection, selectors.EVENT_READ, handler)
+            self.parked += 1
+        self.wake()
+
+    def wake(self):
+        try:
+            self.wake_signal.send(b'\0')
+        except OSError:
+            pass
+
+    def run(self):
+        while self.running:
+            with self.lock:
+                deadline = min(self.handlers.values(), default=None)
+            wait = None if deadline is None else max(0, deadline - time.monotonic())
+            events = self.selector.select(wait)
+            ready = []
+            expired = []
+            with self.lock:
+                if not self.running:
+                    break
+                for key, _ in events:
+                    if key.data is None:
+                        try:
+                            while self.waker.recv(64):
+                                pass
+                        except OSError:
+                            pass
+                    elif key.data in self.handlers:
+                        ready.append(key.data)
+                now = time.monotonic()
+                expired = [h for h, t in self.handlers.items() if t <= now and h not in ready]
+                for handler in ready + expired:
+                    del self.handlers[handler]
+                    self.selector.unregister(handler.connection)
+                self.resumed += len(ready)
+                self.expired += len(expired)
+            for handler in ready:
+                self.resume(handler)
+            for handler in expired:
+                self.expire(handler)
+
+    def close(self):
+        with self.lock:
+            self.running = False
+            handlers = list(self.handlers)
+            self.handlers = {}
+            for handler in handlers:
+                self.selector.unregister(handler.connection)
+        self.wake()
+        for handler in handlers:
+            self.expire(handler)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'idle': len(self.handlers),
+                'parked': self.parked,
+                'resumed': self.resumed,
+                'expired': self.expired,
+            }
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import json, os, re, threading
+from freecad.mnesarco.utils.files import user_cache_dir
+from freecad.mnesarco.utils.extension import def_log_err
+
+log_err = def_log_err('Remote')
+
+MACRO_PATTERN = re.compile(r".*(\.FCMacro|\.py)$", re.IGNORECASE)
+
+# Metadata is expected near the top of the macro
+HEADER_SIZE = 16 * 1024
+
+META_PATTERN = re.compile(
+    r'''^(?P<var>__Name__|__Icon__)\s*=\s*[rRuU]?(?P<q>'|")(?P<value>[^'"\n]*)(?P=q)''',
+    re.MULTILINE)
+
+
+def read_metadata(path):
+    """Extracts __Name__ and __Icon__ from the header of a macro file"""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE).decode('utf-8', errors='replace')
+    meta = {}
+    for match in META_PATTERN.finditer(header):
+        var = match.group('var')
+        if var not in meta and match.group('value'):
+            meta[var] = match.group('value')
+    return meta.get('__Name__', None), meta.get('__Icon__', None)
+
+
+def iter_macro_files(root):
+    """Yields DirEntry of all macro files under root, recursively"""
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return
+    with it:
+        for entry in it:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir():
+                    yield from iter_macro_files(entry.path)
+                elif entry.is_file() and MACRO_PATTERN.match(entry.name):
+                    yield entry
+            except OSError:
+                pass
+
+
+class MacroIndex:
+    """
+    Persistent index of macro metadata keyed by path. A file is read again
+    only if its mtime or size changed since it was indexed.
+    """
+
+    VERSION = 1
+
+    def __init__(self, file=None):
+        self.file = file
+        self.entries = {}  # path -> {mtime, size, name, icon}
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.dirty = False
+
+    def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        if self.file is None:
+            self.file = user_cache_dir().joinpath('macro_index.json')
+        try:
+            data = json.loads(self.file.read_text(encoding='utf-8'))
+            if data.get('version', None) == MacroIndex.VERSION:
+                self.entries = data.get('entries', {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        if not self.dirty:
+            return
+        data = {'version': MacroIndex.VERSION, 'entries': self.entries}
+        tmp = self.file.with_suffix('.tmp')
+        try:
+            tmp.write_text(json.dumps(data), encoding='utf-8')
+            os.replace(tmp, self.file)
+            self.dirty = False
+        except OSError as ex:
+            log_err("Macro index not saved:", ex)
+
+    def get(self, path):
+        with self.lock:
+            self.load()
+            return self.entries.get(path, None)
+
+    def paths_under(self, directory):
+        """Indexed paths inside directory, at any depth"""
+        prefix = os.path.join(directory, '')
+        with self.lock:
+            self.load()
+            return [p for p in self.entries if p.startswith(prefix)]
+
+    def update(self, path, st=None):
+        """Index one file, returns its entry or None if it is not a macro anymore"""
+        with self.lock:
+            self.load()
+            try:
+                st = st or os.stat(path)
+            except OSError:
+                if self.entries.pop(path, None) is not None:
+                    self.dirty = True
+                return None
+            entry = self.entries.get(path, None)
+            if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                return entry
+            try:
+                name, icon = read_metadata(path)
+            except OSError:
+                return None
+            entry = {'mtime': st.st_mtime_ns, 'size': st.st_size, 'name': name, 'icon': icon}
+            self.entries[path] = entry
+            self.dirty = True
+            return entry
+
+    def scan(self, root):
+        """Returns sorted [(path, entry)] of all macros under root"""
+        with self.lock:
+            self.load()
+            found = {}
+            for dir_entry in iter_macro_files(root):
+                entry = self.update(dir_entry.path, dir_entry.stat())
+                if entry:
+                    found[dir_entry.path] = entry
+            root_prefix = os.path.join(str(root), '')
+            for path in list(self.entries):
+                if path.startswith(root_prefix) and path not in found:
+                    del self.entries[path]
+                    self.dirty = True
+            self.save()
+            return sorted(found.items())
+
+
+macro_index = MacroIndex()
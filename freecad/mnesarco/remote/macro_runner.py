@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import hashlib, importlib.util, marshal, os, struct, threading
+from collections import OrderedDict
+from freecad.mnesarco.utils import preferences
+from freecad.mnesarco.utils.files import user_cache_dir
+from freecad.mnesarco.utils.extension import def_log_err
+
+log_err = def_log_err('Remote')
+
+CODE_CAPACITY = 64
+
+# magic, mtime_ns, size
+HEADER = struct.Struct('<4sqq')
+
+
+class MacroRunner:
+    """
+    Runs macros from compiled code objects. Code is cached in memory by
+    path, mtime and size, and optionally as marshalled bytecode on disk,
+    so repeated runs do not read or compile the source again.
+    """
+
+    def __init__(self, capacity=CODE_CAPACITY, root=None):
+        self.capacity = capacity
+        self.root = root
+        self.codes = OrderedDict()  # path -> (mtime_ns, size, code)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.compiles = 0
+
+    def bytecode_enabled(self):
+        return preferences.get_mnesarco_pref('Remote', 'BytecodeCache', kind=bool, default=True)
+
+    def bytecode_file(self, path):
+        if self.root is None:
+            self.root = user_cache_dir('macros')
+        name = hashlib.sha1(path.encode('utf-8')).hexdigest()[:24]
+        return self.root.joinpath(name + '.bin')
+
+    def load_bytecode(self, path, st):
+        try:
+            data = self.bytecode_file(path).read_bytes()
+            magic, mtime, size = HEADER.unpack_from(data)
+            if magic == importlib.util.MAGIC_NUMBER and mtime == st.st_mtime_ns and size == st.st_size:
+                return marshal.loads(data[HEADER.size:])
+        except (OSError, ValueError, EOFError, TypeError, struct.error):
+            pass
+        return None
+
+    def save_bytecode(self, path, st, code):
+        file = self.bytecode_file(path)
+        tmp = file.with_suffix('.tmp')
+        try:
+            header = HEADER.pack(importlib.util.MAGIC_NUMBER, st.st_mtime_ns, st.st_size)
+            tmp.write_bytes(header + marshal.dumps(code))
+            os.replace(tmp, file)
+        except OSError as ex:
+            log_err("Macro bytecode not saved:", ex)
+
+    def code(self, path):
+        """Returns the code object of the macro, compiling it only if required"""
+        st = os.stat(path)
+        with self.lock:
+            cached = self.codes.get(path, None)
+            if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                self.codes.move_to_end(path)
+                self.hits += 1
+                return cached[2]
+        persistent = self.bytecode_enabled()
+        code = self.load_bytecode(path, st) if persistent else None
+        if code:
+            self.disk_hits += 1
+        else:
+            with open(path, 'rb') as f:
+                code = compile(f.read(), path, 'exec')
+            self.compiles += 1
+            if persistent:
+                self.save_bytecode(path, st, code)
+        with self.lock:
+            self.codes[path] = (st.st_mtime_ns, st.st_size, code)
+            self.codes.move_to_end(path)
+            while len(self.codes) > self.capacity:
+                self.codes.popitem(last=False)
+        return code
+
+    def run(self, path):
+        """Executes the macro in the Gui interpreter namespace"""
+        import __main__
+        exec(self.code(path), __main__.__dict__)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.codes),
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'compiles': self.compiles,
+            }
+
+
+macro_runner = MacroRunner()
+
+
+def run_macro(path):
+    """Entry point recorded in the command history by remote macro actions"""
+    macro_runner.run(path)
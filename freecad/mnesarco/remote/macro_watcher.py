@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import os
+from freecad.mnesarco.utils.qt import QtCore
+from freecad.mnesarco.remote.macro_index import macro_index, iter_macro_files, MACRO_PATTERN
+
+ADDED = 'added'
+CHANGED = 'changed'
+REMOVED = 'removed'
+
+
+def iter_dirs(root):
+    yield root
+    try:
+        with os.scandir(root) as it:
+            dirs = [e.path for e in it if e.is_dir() and not e.name.startswith('.')]
+    except OSError:
+        return
+    for path in dirs:
+        yield from iter_dirs(path)
+
+
+class MacroWatcher(QtCore.QObject):
+    """
+    Watches the macro directory tree and updates the macro index one file
+    at a time. `on_change(change, path, entry)` is called in the Gui thread
+    for every macro added, changed or removed.
+    """
+
+    def __init__(self, on_change, *args, **kwargs):
+        super(MacroWatcher, self).__init__(*args, **kwargs)
+        self.on_change = on_change
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.directory_changed)
+        self.watcher.fileChanged.connect(self.file_changed)
+
+    def start(self, root):
+        self.watch_tree(str(root))
+
+    def stop(self):
+        paths = self.watcher.directories() + self.watcher.files()
+        if paths:
+            self.watcher.removePaths(paths)
+
+    def watch_tree(self, root):
+        dirs = list(iter_dirs(root))
+        files = [e.path for e in iter_macro_files(root)]
+        self.watcher.addPaths(dirs + files)
+        return files
+
+    def directory_changed(self, directory):
+        current = []
+        subdirs = set()
+        try:
+            with os.scandir(directory) as it:
+                for e in it:
+                    if e.name.startswith('.'):
+                        continue
+                    if e.is_dir():
+                        subdirs.add(e.name)
+                        if e.path not in self.watcher.directories():
+                            current.extend(self.watch_tree(e.path))
+                    elif e.is_file() and MACRO_PATTERN.match(e.name):
+                        current.append(e.path)
+        except OSError:
+            # Removed while scanning, or before: drop the whole subtree
+            for path in macro_index.paths_under(directory):
+                self.refresh(path)
+            macro_index.save()
+            return
+        watched = set(self.watcher.files())
+        for path in current:
+            if path not in watched:
+                self.watcher.addPath(path)
+            self.refresh(path)
+        # Files gone from this directory or from a removed subtree
+        for path in macro_index.paths_under(directory):
+            if path in current:
+                continue
+            parts = os.path.relpath(path, directory).split(os.sep)
+            if len(parts) == 1 or parts[0] not in subdirs:
+                self.refresh(path)
+        macro_index.save()
+
+    def file_changed(self, path):
+        # Editors that save by rename drop the watch, add it again
+        if os.path.exists(path) and path not in self.watcher.files():
+            self.watcher.addPath(path)
+        self.refresh(path)
+        macro_index.save()
+
+    def refresh(self, path):
+        before = macro_index.get(path)
+        after = macro_index.update(path)
+        if after is None:
+            if before is not None:
+                self.on_change(REMOVED, path, None)
+        elif before is None:
+            self.on_change(ADDED, path, after)
+        elif after is not before:
+            self.on_change(CHANGED, path, after)
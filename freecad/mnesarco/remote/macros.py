@@ -18,7 +18,7 @@
 # along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
 # 
 
-import ast, hashlib, json, re
+import json
 from pathlib import Path
 from freecad.mnesarco import App
 from freecad.mnesarco.utils import strings
@@ -26,23 +26,15 @@ from freecad.mnesarco.utils import preferences
 from freecad.mnesarco.remote import page
 from freecad.mnesarco.resources import tr
 from freecad.mnesarco.remote.exports import export_file, export_macro
+from freecad.mnesarco.utils.icon_cache import icon_cache
+from freecad.mnesarco.remote.macro_index import macro_index
 
 class MacroWrapper:
 
-    def __init__(self, path):
-        code = ast.parse(path.read_bytes(), str(path), mode="exec")
+    def __init__(self, path, name=None, icon=None):
         self.file = str(path)
-        self.key = hashlib.sha256(str(path).encode()).hexdigest()
-        self.name = path.stem
-        
-        defined_icon = None
-        for node in code.body:
-            if isinstance(node, ast.Assign):
-                assign_name = node.targets[0].id
-                if assign_name == '__Name__' and node.value.s:
-                    self.name = node.value.s
-                elif assign_name == '__Icon__' and node.value.s:
-                    defined_icon = path.parent.joinpath(node.value.s)
+        self.name = name or path.stem
+        defined_icon = path.parent.joinpath(icon) if icon else None
 
         self.name = " ".join(strings.camel_terms(self.name))
 
@@ -58,13 +50,14 @@ class MacroWrapper:
                 if not self.icon.exists():
                     self.icon = None
 
-        if self.icon:
-            self.icon = str(self.icon)
-        else:
+        if not self.icon:
             self.icon = get_next_icon(path.stem)
 
-        self.icon = export_file(self.icon)
-        export_macro(self)
+        # Generic icons are relative to the remote document root
+        if Path(self.icon).is_absolute():
+            self.icon = export_file(icon_cache.file(self.icon, page.ICON_SIZE) or self.icon)
+
+        self.key = export_macro(self)
 
 
 class AllMacrosPage(page.Page):
@@ -73,23 +66,28 @@ class AllMacrosPage(page.Page):
         return tr("All Macros")
 
     def sections(self):
-        macros = get_all_macros()
-        actions = [page.Action(m.name, m.icon, '/macro/{}'.format(m.key)) for m in macros]
+        actions = [macro_action(m) for m in get_all_macros()]
         return [page.Section(tr("All"), actions)]
 
 
-def get_all_macros():
-    macros = []
-    PATTERN = re.compile(r".*(\.FCMacro|.py)$", re.IGNORECASE)
+def macro_action(macro):
+    return page.Action(macro.name, macro.icon, '/macro/{}'.format(macro.key))
+
+
+def get_macro_dir():
     root = Path(App.getUserMacroDir(True))
     if not root.exists():
         root = Path(App.getUserMacroDir(False))
-    for file in root.glob('*'):
-        if PATTERN.match(file.name):
-            try:
-                macros.append(MacroWrapper(file))
-            except (AttributeError, FileNotFoundError, SyntaxError):
-                pass
+    return root
+
+
+def get_all_macros():
+    macros = []
+    for path, entry in macro_index.scan(get_macro_dir()):
+        try:
+            macros.append(MacroWrapper(Path(path), entry['name'], entry['icon']))
+        except (AttributeError, FileNotFoundError):
+            pass
     return macros
 
 
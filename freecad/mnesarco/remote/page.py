@@ -17,6 +17,10 @@
 # You should have received a copy of the GNU General Public License
 # along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
 # 
+import base64, mimetypes
+
+# Icon size in css pixels
+ICON_SIZE = 64
 
 class Page:
 
@@ -29,11 +33,13 @@ class Page:
     def stylesheet(self):
         return "css/default.css"
 
-    def data(self):
+    def data(self, sections=None):
+        if sections is None:
+            sections = self.sections()
         return {
             'title': self.title(),
             'stylesheet': self.stylesheet(),
-            'sections': [s.data() for s in self.sections()]
+            'sections': [s.data() for s in sections]
         }
 
 class Section:
@@ -50,10 +56,49 @@ class Section:
 
 class Action:
     
-    def __init__(self, title, icon, action):
+    def __init__(self, title, icon, action, icon2x=None):
         self.title = title
         self.icon = icon
         self.action = action
+        self.icon2x = icon2x
 
     def data(self):
-        return self.__dict__
\ No newline at end of file
+        return {k: v for k, v in self.__dict__.items() if v is not None}
+
+
+def icon_urls(data, scale=1):
+    """
+    All distinct icon urls used in page data, in order of appearance,
+    paired with the url of the variant for the requested scale.
+    """
+    urls = {}
+    for section in data.get('sections', []):
+        for action in section.get('actions', []):
+            icon = action.get('icon', None)
+            if icon:
+                variant = action.get('icon2x', None) if scale > 1 else None
+                urls[icon] = variant or icon
+    return list(urls.items())
+
+
+def icon_bundle(urls, resolve):
+    """
+    Map each icon url to an inline data uri, so a client can render
+    all the icons of a page with a single request.
+
+    :param urls: (icon url, variant url) pairs
+    :param resolve: function that maps an url to a local file path or None
+    """
+    bundle = {}
+    for url, variant in urls:
+        path = resolve(variant)
+        if not path:
+            continue
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            continue
+        mime = mimetypes.guess_type(str(path))[0] or 'application/octet-stream'
+        bundle[url] = 'data:{};base64,{}'.format(mime, base64.b64encode(content).decode('ascii'))
+    return bundle
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+from freecad.mnesarco.gui import Gui
+from freecad.mnesarco.remote import workbenches
+from freecad.mnesarco.utils.timers import execute_later
+from freecad.mnesarco.utils.extension import def_log, def_log_err
+
+log = def_log('Remote')
+log_err = def_log_err('Remote')
+
+# Delay between slices, lets the event loop process user input
+SLICE_DELAY = 20
+
+
+class Prewarm:
+    """
+    Builds all workbench pages in the Gui thread, one toolbar per event
+    loop iteration, so first loads from remote clients are instant.
+
+    Workbenches never activated in this session have no toolbars yet and
+    are skipped, they are built on first request as usual.
+    """
+
+    def __init__(self, cache, on_page=None):
+        self.cache = cache
+        self.on_page = on_page
+        self.total = 0
+        self.done = 0
+        self.skipped = 0
+        self.running = False
+        self.tasks = None
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.tasks = self.steps()
+            execute_later(self.step, SLICE_DELAY)
+
+    def step(self):
+        try:
+            next(self.tasks)
+        except StopIteration:
+            self.running = False
+            log("Remote pages ready: {} built, {} skipped".format(self.done, self.skipped))
+            return
+        except BaseException as ex:
+            log_err("Remote prewarm failed:", ex)
+            self.running = False
+            return
+        execute_later(self.step, SLICE_DELAY)
+
+    def steps(self):
+        keys = [k for k in Gui.listWorkbenches() if k not in workbenches.excluded]
+        self.total = len(keys)
+        for key in keys:
+            if not workbenches.is_loaded(key):
+                self.skipped += 1
+                continue
+            page = workbenches.WorkbenchPage(key)
+            sections = []
+            for section in page.iter_sections():
+                sections.append(section)
+                yield
+            cached = self.cache.put(
+                '/workbench-actions/' + key,
+                page.data(sections),
+                lambda key=key: workbenches.WorkbenchPage(key))
+            if self.on_page:
+                self.on_page(cached)
+            self.done += 1
+            log("Remote pages: {}/{}".format(self.done + self.skipped, self.total))
+            yield
+
+    def status(self):
+        return {
+            'running': self.running,
+            'total': self.total,
+            'done': self.done,
+            'skipped': self.skipped,
+        }
@@ -19,48 +19,260 @@
 # 
 
 
-import json, os, re
+import gzip, io, json, os, threading, time
+from contextlib import contextmanager
 from pathlib import Path
+from urllib.parse import unquote, urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from http.server import HTTPServer as BaseHTTPServer, SimpleHTTPRequestHandler
 from freecad.mnesarco.resources import tr, resources_path
+from freecad.mnesarco import App
 from freecad.mnesarco.gui import Gui
 from freecad.mnesarco.utils import preferences, qt
-from freecad.mnesarco.remote import macros, workbenches
+from freecad.mnesarco.remote import macros, workbenches, documents, static, page, cache, prewarm
 from freecad.mnesarco.utils.extension import log_err, log
-from freecad.mnesarco.remote.exports import get_exported_file, get_exported_macro, get_exported_action
+from freecad.mnesarco.remote import exports
+from freecad.mnesarco.remote.exports import get_exported_file, get_exported_macro, get_exported_action, get_exported_document
 from freecad.mnesarco.utils.dialogs import message_dialog, error_dialog
 from freecad.mnesarco.utils import networking
+from freecad.mnesarco.utils.icon_cache import icon_cache
+from freecad.mnesarco.remote.events import event_bus
+from freecad.mnesarco.remote.streamer import EventStreamer
+from freecad.mnesarco.remote.viewport import ViewStreamer, MAX_FPS
+from freecad.mnesarco.remote.document_observer import DocumentObserver, CREATED, DELETED
+from freecad.mnesarco.remote.document_tree import document_tree, object_data
+from freecad.mnesarco.remote.camera_input import CameraInput
+from freecad.mnesarco.remote.macro_watcher import MacroWatcher
+from freecad.mnesarco.remote.macro_runner import macro_runner
+from freecad.mnesarco.remote.idle_connections import IdleConnections
+from freecad.mnesarco.remote import gui_queue as gq
 
 
 DOCROOT = resources_path.joinpath('ui', 'remote')
 GUI_TIMEOUT = 6000
-GUI_POLL = 300
 VERBOSE = False
+DEFAULT_WORKERS = 8
+KEEP_ALIVE_TIMEOUT = 5
+GUI_SLOT_WAIT = 1.0
+EVENTS_TIMEOUT = 20
+
+# Camera and view commands are cheap and run before other queued actions
+VIEW_COMMANDS = ('Std_View', 'Std_OrthographicCamera', 'Std_PerspectiveCamera', 'Std_DrawStyle')
 
 class HTTPHandler(SimpleHTTPRequestHandler):
 
+    protocol_version = 'HTTP/1.1'
+    detached = False
+    parked = False
+
+    # Max seconds to read a request, and to wait idle for the next one
+    timeout = KEEP_ALIVE_TIMEOUT
+
+    # Headers and body are separate writes, with Nagle the body of a
+    # keep-alive response waits for the delayed ack of the headers
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        """
+        Serve the requests already received, then leave the connection to
+        the server idle watcher instead of blocking the worker until the
+        client sends the next one.
+        """
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and not self.detached and self.has_buffered_request():
+            self.handle_one_request()
+        self.parked = not self.close_connection and not self.detached
+
+
+    def resume(self):
+        """The parked connection has data (worker thread)"""
+        self.parked = False
+        try:
+            self.handle()
+        finally:
+            self.finish()
+
+
+    def finish(self):
+        if not self.parked:
+            SimpleHTTPRequestHandler.finish(self)
+
+
+    def has_buffered_request(self):
+        """True if the next request was already received, never blocks"""
+        try:
+            self.connection.setblocking(False)
+            return bool(self.rfile.peek(1))
+        except (OSError, ValueError):
+            return False
+        finally:
+            try:
+                self.connection.settimeout(self.timeout)
+            except OSError:
+                pass
+
+
     def translate_path(self, path):
-        path = get_exported_file(path)
-        if path and Path(path).exists() and not Path(path).is_dir():
-            return path
+        exported = get_exported_file(urlsplit(path).path)
+        if exported and Path(exported).exists() and not Path(exported).is_dir():
+            return exported
         path = SimpleHTTPRequestHandler.translate_path(self, path)
         relpath = os.path.relpath(path, os.getcwd())
         fullpath = os.path.join(self.server.base_path, relpath)
         return fullpath
 
 
+    def send_head(self):
+        """Serve files with ETag/Last-Modified validation and gzip"""
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, 'index.html')
+            if not self.path.endswith('/') or not os.path.isfile(index):
+                return SimpleHTTPRequestHandler.send_head(self)
+            path = index
+
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+
+        immutable = get_exported_file(urlsplit(self.path).path) is not None
+        cache_control = static.CACHE_IMMUTABLE if immutable else static.CACHE_REVALIDATE
+        etag = static.file_etag(st)
+        last_modified = self.date_time_string(st.st_mtime)
+
+        if_none_match = self.headers.get('If-None-Match', None)
+        if static.etag_matches(etag, if_none_match) or \
+                (not if_none_match and self.headers.get('If-Modified-Since', None) == last_modified):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.end_headers()
+            return None
+
+        ctype = self.guess_type(path)
+        compressible = static.is_compressible(ctype, st.st_size)
+        try:
+            if compressible and static.accepts_gzip(self.headers):
+                data = static.gzip_cache.get(path, etag)
+                f, length = io.BytesIO(data), len(data)
+            else:
+                f, length = open(path, 'rb'), st.st_size
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+
+        self.send_response(200)
+        self.send_header('Content-type', ctype)
+        self.send_header('Content-Length', str(length))
+        self.send_header('Last-Modified', last_modified)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control)
+        if compressible:
+            self.send_header('Vary', 'Accept-Encoding')
+            if isinstance(f, io.BytesIO):
+                self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        return f
+
+
+    def end_headers(self):
+        # Do not keep idle connections around when all workers are busy
+        if not self.close_connection and self.server.saturated():
+            self.send_header('Connection', 'close')
+        SimpleHTTPRequestHandler.end_headers(self)
+
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length', None) or 0)
+        return self.rfile.read(length) if length > 0 else b''
+
+
+    def do_GET(self):
+        ctrl, args = router.dispatch(self.path, accept=lambda c: getattr(c, 'allow_get', False))
+        if not ctrl:
+            SimpleHTTPRequestHandler.do_GET(self)
+            return
+        self.run_controller(ctrl, args)
+
+
     def do_POST(self):
+        self.body = self.read_body()
+        ctrl, args = router.dispatch(self.path)
+        if not ctrl:
+            self.send_json({'status': 'error', 'message': 'Unknown action'}, 404)
+            return
+        self.run_controller(ctrl, args)
+
+
+    def run_controller(self, ctrl, args):
+        try:
+            if getattr(ctrl, 'gui_bound', False):
+                with self.server.gui_slot():
+                    result = ctrl.run(self, *args)
+            else:
+                result = ctrl.run(self, *args)
+            if self.detached:
+                # The connection now belongs to a streamer
+                return
+            if isinstance(result, cache.CachedPage):
+                self.send_page(result)
+            else:
+                self.send_json(result)
+        except GuiTimeoutError as ex:
+            self.send_json({'status': 'timeout', 'message': str(ex)}, 504)
+        except BadRequestError as ex:
+            self.send_json({'status': 'error', 'message': str(ex)}, 400)
+        except gq.QueueFullError:
+            self.send_json({'status': 'error', 'message': 'Too many pending actions'}, 429, {'Retry-After': '1'})
+        except ServerBusyError as ex:
+            self.send_json({'status': 'error', 'message': str(ex)}, 503, {'Retry-After': '1'})
+        except BaseException as ex:
+            self.send_json({'status': 'error', 'error': type(ex).__name__, 'message': str(ex)}, 500)
+
+
+    def detach(self):
+        """Hand over the socket, it will not be closed when the request ends"""
+        self.detached = True
+        self.close_connection = True
+
+
+    def send_json(self, data, status=200, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-type', 'text/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if static.is_compressible('text/json', len(body)) and static.accepts_gzip(self.headers):
+            body = gzip.compress(body, compresslevel=6)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def send_page(self, page):
+        """Send pre-encoded page, or 304 if the client already has it"""
+        if static.etag_matches(page.etag, self.headers.get('If-None-Match', None)):
+            self.send_response(304)
+            self.send_header('ETag', page.etag)
+            self.send_header('Cache-Control', static.CACHE_REVALIDATE)
+            self.end_headers()
+            return
+        gzipped = static.accepts_gzip(self.headers)
+        body = page.gzipped if gzipped else page.body
         self.send_response(200)
         self.send_header('Content-type', 'text/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', page.etag)
+        self.send_header('Cache-Control', static.CACHE_REVALIDATE)
+        self.send_header('Vary', 'Accept-Encoding')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
         self.end_headers()
-        ctrl = router.get(self.path)
-        if ctrl:
-            try:
-                ctrl.run(self)
-            except BaseException as ex:
-                self.wfile.write(json.dumps({'status': 'error', 'message': str(ex)}).encode())    
-        else:
-            self.wfile.write(json.dumps({'status': 'error', 'message': 'Unknown action'}).encode())
+        self.wfile.write(body)
 
 
     def log_request(self, *args, **kwargs):
@@ -68,83 +280,259 @@ class HTTPHandler(SimpleHTTPRequestHandler):
 
 
 class RemoteCtrlServer(BaseHTTPServer):
+    """
+    HTTP Server with a bounded pool of worker threads.
 
-    def __init__(self, base_path, server_address, rhc=HTTPHandler):
+    Requests are handled concurrently by up to `workers` threads. At most half
+    of them can be waiting for the Gui thread at any time, so static files and
+    icons are always served while slow Gui actions are running. Idle
+    keep-alive connections are watched by a single thread and do not hold
+    a worker between requests.
+    """
+
+    def __init__(self, base_path, server_address, rhc=HTTPHandler, workers=DEFAULT_WORKERS):
         self.base_path = base_path
+        self.workers = max(2, workers)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='RemoteCtrl')
+        self.gui_slots = threading.BoundedSemaphore(max(1, self.workers // 2))
+        self.event_slots = threading.BoundedSemaphore(max(1, self.workers // 4))
+        self.connections = 0
+        self.connections_lock = threading.Lock()
+        self.streamer = EventStreamer(event_bus)
+        self.view_streamer = ViewStreamer(gui_queue)
+        self.idle = IdleConnections(self.resume_request, self.expire_request, KEEP_ALIVE_TIMEOUT)
         BaseHTTPServer.__init__(self, server_address, rhc)
+        self.idle.start()
+
+    def saturated(self):
+        return self.connections >= self.workers
+
+    @contextmanager
+    def gui_slot(self):
+        """
+        Reserve one of the workers allowed to wait for the Gui thread. Waits up
+        to GUI_SLOT_WAIT for a slot, then raises ServerBusyError.
+        """
+        if not self.gui_slots.acquire(timeout=GUI_SLOT_WAIT):
+            raise ServerBusyError(tr("Server busy"))
+        try:
+            yield
+        finally:
+            self.gui_slots.release()
+
+    def process_request(self, request, client_address):
+        """Hand the connection to the pool, the accept loop never blocks"""
+        with self.connections_lock:
+            self.connections += 1
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def finish_request(self, request, client_address):
+        return self.RequestHandlerClass(request, client_address, self)
+
+    def process_request_thread(self, request, client_address, handler=None):
+        try:
+            if handler:
+                handler.resume()
+            else:
+                handler = self.finish_request(request, client_address)
+        except Exception:
+            if handler:
+                handler.parked = False
+            self.handle_error(request, client_address)
+        finally:
+            with self.connections_lock:
+                self.connections -= 1
+            if handler and handler.parked:
+                # Idle keep-alive connections do not hold a worker
+                self.idle.park(handler)
+            elif not (handler and handler.detached):
+                self.shutdown_request(request)
+
+    def resume_request(self, handler):
+        """A parked connection received data (idle thread)"""
+        with self.connections_lock:
+            self.connections += 1
+        self.pool.submit(self.process_request_thread, handler.request, handler.client_address, handler)
+
+    def expire_request(self, handler):
+        """A parked connection was idle for too long"""
+        handler.parked = False
+        try:
+            handler.finish()
+        except OSError:
+            pass
+        self.shutdown_request(handler.request)
+
+    def server_close(self):
+        BaseHTTPServer.server_close(self)
+        self.idle.close()
+        self.streamer.close()
+        self.view_streamer.close()
+        self.pool.shutdown(wait=False)
 
 
 class ServerThread(qt.QtCore.QThread):
     
     def run(self):
-        self.httpd = RemoteCtrlServer(DOCROOT, ("", preferences.get_mnesarco_pref('Remote', 'Port', kind=int, default=8521)))
+        port = preferences.get_mnesarco_pref('Remote', 'Port', kind=int, default=8521)
+        workers = preferences.get_mnesarco_pref('Remote', 'Workers', kind=int, default=DEFAULT_WORKERS)
+        self.httpd = RemoteCtrlServer(DOCROOT, ("", port), workers=workers)
         self.httpd.serve_forever()
     
     def stop(self):
         self.httpd.shutdown()
-        self.httpd.socket.close()
+        self.httpd.server_close()
         self.wait()
 
-class GetWorkbenches:
+page_cache = cache.PageCache()
+# Icon urls are immutable, keep the pngs that clients can still request
+icon_cache.set_in_use(exports.exported_paths)
+gui_queue = gq.GuiQueue(Gui.getMainWindow())
+document_observer = DocumentObserver()
+camera_input = CameraInput(Gui.getMainWindow())
 
-    cache = None
 
-    def run(self, request):
-        if not GetWorkbenches.cache:
-            GetWorkbenches.cache = workbenches.AllWorkbenchesPage()
-        request.wfile.write(json.dumps(GetWorkbenches.cache.data()).encode())
+class PageController:
+    """Serves a page from the encoded page cache"""
 
+    allow_get = True
 
-class GetMacros:
+    def key(self, *args):
+        raise NotImplementedError()
 
-    cache = None
+    def build(self, *args):
+        raise NotImplementedError()
 
-    def run(self, request):
-        if not GetMacros.cache:
-            GetMacros.cache = macros.AllMacrosPage()
-        request.wfile.write(json.dumps(GetMacros.cache.data()).encode())
+    def run(self, request, *args):
+        key = self.key(*args)
+        page = page_cache.peek(key)
+        if page:
+            return page
+        # Pages read widgets and render icons, build them in the Gui thread.
+        # Waiting for it takes a Gui slot like any other Gui action.
+        with request.server.gui_slot():
+            future = gui_queue.submit(lambda: page_cache.get(key, lambda: self.build(*args)), key=('page', key))
+            try:
+                return future.result(timeout=GUI_TIMEOUT / 1000.0)
+            except FutureTimeoutError:
+                gui_queue.release(future)
+                raise GuiTimeoutError(tr("Gui thread did not respond in time"))
 
 
-class GetWorkbenchActions:
+class GetWorkbenches(PageController):
 
-    cache = {}
+    def key(self):
+        return '/workbenches'
 
-    def run(self, request):
-        wb = re.match('/workbench-actions/(.*)', request.path).group(1)
-        cache = GetWorkbenchActions.cache.get(wb, None) 
-        if not cache:
-            cache = workbenches.WorkbenchPage(wb)
-            GetWorkbenchActions.cache[wb] = cache
-        request.wfile.write(json.dumps(cache.data()).encode())
+    def build(self):
+        return workbenches.AllWorkbenchesPage()
+
+
+class GetMacros(PageController):
+
+    def key(self):
+        return '/macros'
+
+    def build(self):
+        return macros.AllMacrosPage()
+
+
+class GetDocuments(PageController):
+
+    def key(self):
+        return '/documents'
+
+    def build(self):
+        return documents.RecentDocumentsPage()
+
+
+class GetWorkbenchActions(PageController):
+
+    def key(self, wb):
+        return '/workbench-actions/' + wb
+
+    def build(self, wb):
+        return workbenches.WorkbenchPage(wb)
+
+
+class GetIconBundle(PageController):
+    """
+    All the icons of a page inlined as data uris: /icons/<page path>.
+    The bundle is built once and kept next to the cached page.
+    """
+
+    def run(self, request, page_path):
+        route, args = router.lookup('/' + page_path)
+        if not route or not isinstance(route.ctrl, PageController) or isinstance(route.ctrl, GetIconBundle):
+            raise LookupError(tr("Invalid page: {}").format(page_path))
+        scale = 2 if 'scale=2' in urlsplit(request.path).query else 1
+        return page_bundle(route.ctrl.run(request, *args), scale)
+
+
+def page_bundle(cached, scale=1):
+    bundle = cached.bundles.get(scale, None)
+    if not bundle:
+        urls = page.icon_urls(cached.data, scale)
+        icons = page.icon_bundle(urls, resolve_icon)
+        bundle = cache.CachedPage({'status': 'ok', 'icons': icons}, cached.version)
+        cached.bundles[scale] = bundle
+    return bundle
+
+
+def resolve_icon(url):
+    exported = get_exported_file(url)
+    if exported:
+        return exported
+    path = DOCROOT.joinpath(url).resolve()
+    if DOCROOT.resolve() in path.parents and path.is_file():
+        return path
+
+
+class GuiTimeoutError(Exception):
+    pass
+
+
+class BadRequestError(Exception):
+    pass
+
+
+class ServerBusyError(Exception):
+    pass
+
+
+def json_value(value):
+    """Make value safe for json encoding"""
+    try:
+        json.dumps(value)
+        return value
+    except (TypeError, ValueError):
+        return str(value)
 
 
 class ActionController:
 
-    def __init__(self):
-        self.signal = qt.SignalObject(Gui.getMainWindow())
-        self.signal.forward(self.pre_run_gui)
-        self.lock = False
+    gui_bound = True
 
     def send_to_gui(self, *args):
-        """Forward code to Gui Thread and wait for completion"""
-        self.lock = True
-        self.signal.trigger(*args)
-        wait = 0        
-        while self.lock and wait < GUI_TIMEOUT:
-            qt.QtCore.QThread.msleep(GUI_POLL)
-            wait += GUI_POLL
-        self.lock = False
-
-    def pre_run_gui(self, args):
+        """Queue code for the Gui Thread and wait for its result"""
+        future = gui_queue.submit(lambda: self.run_gui(args), self.priority(args), self.coalesce_key(args))
         try:
-            self.run_gui(args)
-        except:
-            pass
-        self.lock = False
+            return future.result(timeout=GUI_TIMEOUT / 1000.0)
+        except FutureTimeoutError:
+            # If the Gui thread did not start it yet, it will be skipped
+            gui_queue.release(future)
+            raise GuiTimeoutError(tr("Gui thread did not respond in time"))
 
-    def run(self, request):
+    def priority(self, args):
+        return gq.PRIORITY_NORMAL
+
+    def coalesce_key(self, args):
+        """Pending requests with the same key run only once, None to never coalesce"""
+        return None
+
+    def run(self, request, *args):
         """Code to be executed in Server Thread"""
-        pass
+        return {'status': 'ok'}
 
     def run_gui(self, args):
         """Implemented in subclasses"""
@@ -156,14 +544,15 @@ class ActivateWorkbench(ActionController):
     def __init__(self):
         super(ActivateWorkbench, self).__init__()
 
+    def coalesce_key(self, args):
+        return ('workbench', args[0])
+
     def run_gui(self, args):
-        Gui.activateWorkbench(args[0])
+        return Gui.activateWorkbench(args[0])
 
-    def run(self, request):
-        match = re.match('/workbench/(.*)', request.path)
-        workbench = match.group(1)
-        self.send_to_gui(workbench)
-        request.wfile.write(json.dumps({'status': 'ok', 'workbench': workbench}).encode())
+    def run(self, request, workbench):
+        result = self.send_to_gui(workbench)
+        return {'status': 'ok', 'workbench': workbench, 'result': json_value(result)}
 
 
 class RunMacro(ActionController):
@@ -171,24 +560,59 @@ class RunMacro(ActionController):
     def __init__(self):
         super(RunMacro, self).__init__()
 
+    def priority(self, args):
+        return gq.PRIORITY_SLOW
+
     def run_gui(self, args):
         macro = get_exported_macro(args[0])
         if macro:
             macro = Path(macro)
             try:
-                Gui.doCommandGui("exec(open(\"{0}\").read())".format(macro.as_posix()))
+                Gui.doCommandGui(
+                    "from freecad.mnesarco.remote.macro_runner import run_macro; run_macro({!r})"
+                    .format(macro.as_posix()))
             except BaseException as ex:
                 log_err(tr("Error in macro: "), macro)
-                log_err(ex)            
+                log_err(ex)
+                event_bus.publish('macroFinished', action='/macro/' + args[0], status='error')
+                raise
+            event_bus.publish('macroFinished', action='/macro/' + args[0], status='ok')
         else:
-            log_err(tr("Macro {} does not exists").format(macro))            
+            log_err(tr("Macro {} does not exists").format(args[0]))
+            raise FileNotFoundError(tr("Macro {} does not exists").format(args[0]))
 
-    def run(self, request):
-        match = re.match('/macro/(.*)', request.path)
-        macro = match.group(1)
+    def run(self, request, macro):
         self.send_to_gui(macro)
-        request.wfile.write(json.dumps({'status': 'ok'}).encode())
+        return {'status': 'ok', 'macro': macro}
+
+
+
+class OpenDocument(ActionController):
+    """Opens a recent document, or activates it if it is already open"""
+
+    def __init__(self):
+        super(OpenDocument, self).__init__()
+
+    def priority(self, args):
+        return gq.PRIORITY_SLOW
+
+    def coalesce_key(self, args):
+        return ('open-document', args[0])
+
+    def run_gui(self, args):
+        path = get_exported_document(args[0])
+        if not path:
+            raise LookupError(tr("Document {} does not exists").format(args[0]))
+        for doc in App.listDocuments().values():
+            if doc.FileName and Path(doc.FileName) == Path(path):
+                Gui.setActiveDocument(doc.Name)
+                return doc.Name
+        Gui.doCommandGui("FreeCAD.openDocument({!r})".format(Path(path).as_posix()))
+        return App.ActiveDocument.Name if App.ActiveDocument else None
 
+    def run(self, request, key):
+        document = self.send_to_gui(key)
+        return {'status': 'ok', 'key': key, 'document': document}
 
 
 class RunCommand(ActionController):
@@ -196,46 +620,405 @@ class RunCommand(ActionController):
     def __init__(self):
         super(RunCommand, self).__init__()
 
+    def is_view_command(self, key):
+        name = exports.get_exported_action_name(key)
+        return bool(name) and name.startswith(VIEW_COMMANDS)
+
+    def priority(self, args):
+        return gq.PRIORITY_VIEW if self.is_view_command(args[0]) else gq.PRIORITY_NORMAL
+
+    def coalesce_key(self, args):
+        # Repeating a view command is a no-op, other commands are not idempotent
+        return ('action', args[0]) if self.is_view_command(args[0]) else None
+
     def run_gui(self, args):
         qaction = get_exported_action(args[0])
-        if qaction:
-            qaction.trigger()
+        if not qaction:
+            raise LookupError(tr("Action {} does not exists").format(args[0]))
+        qaction.trigger()
 
-    def run(self, request):
-        match = re.match('/action/(.*)', request.path)
-        key = match.group(1)
+    def run(self, request, key):
         self.send_to_gui(key)
-        request.wfile.write(json.dumps({'status': 'ok', 'key': key}).encode())
+        return {'status': 'ok', 'key': key}
+
+
+class RunBatch(ActionController):
+    """
+    Runs a sequence of steps in a single Gui slot. The body is json:
+    {"steps": [{"workbench": name} | {"action": key} | {"macro": key}, ...],
+     "recompute": false}
+    Steps stop at the first error, the response has the result and time of
+    every step.
+    """
+
+    MAX_STEPS = 64
+
+    def __init__(self):
+        super(RunBatch, self).__init__()
+
+    def priority(self, args):
+        return gq.PRIORITY_SLOW
+
+    def parse(self, body):
+        try:
+            data = json.loads(body.decode('utf-8') or '{}')
+        except ValueError as ex:
+            raise BadRequestError(tr("Invalid batch: {}").format(ex))
+        steps = data.get('steps', None) if isinstance(data, dict) else None
+        if not isinstance(steps, list) or not 0 < len(steps) <= RunBatch.MAX_STEPS:
+            raise BadRequestError(tr("A batch requires 1 to {} steps").format(RunBatch.MAX_STEPS))
+        parsed = []
+        for step in steps:
+            kinds = [k for k in BATCH_STEPS if isinstance(step, dict) and k in step]
+            if len(kinds) != 1 or not isinstance(step[kinds[0]], str):
+                raise BadRequestError(tr("Invalid batch step: {}").format(json.dumps(step)))
+            parsed.append((kinds[0], step[kinds[0]]))
+        return parsed, bool(data.get('recompute', False))
+
+    def run_gui(self, args):
+        steps, recompute = args
+        results = []
+        failed = False
+        for kind, value in steps:
+            result = {kind: value}
+            results.append(result)
+            if failed:
+                result['status'] = 'skipped'
+                continue
+            start = time.perf_counter()
+            try:
+                result['result'] = json_value(BATCH_STEPS[kind].run_gui((value,)))
+                result['status'] = 'ok'
+            except BaseException as ex:
+                result.update(status='error', error=type(ex).__name__, message=str(ex))
+                failed = True
+            result['ms'] = round((time.perf_counter() - start) * 1000, 3)
+        if recompute and not failed and App.ActiveDocument:
+            start = time.perf_counter()
+            App.ActiveDocument.recompute()
+            results.append({'recompute': True, 'status': 'ok', 'ms': round((time.perf_counter() - start) * 1000, 3)})
+        return results, failed
+
+    def run(self, request):
+        steps, recompute = self.parse(request.body)
+        start = time.perf_counter()
+        results, failed = self.send_to_gui(steps, recompute)
+        total = (time.perf_counter() - start) * 1000
+        return {
+            'status': 'error' if failed else 'ok',
+            'steps': results,
+            'ms': round(total, 3),
+            'wait_ms': round(total - sum(r.get('ms', 0) for r in results), 3),
+        }
+
+
+class GetDocumentTree(ActionController):
+    """Objects and simple properties of the active document, with its revision"""
+
+    allow_get = True
+
+    def coalesce_key(self, args):
+        return ('document-tree',)
+
+    def run_gui(self, args):
+        doc = App.ActiveDocument
+        changes = document_observer.changes
+        if not doc:
+            changes.activate(None)
+            return {'status': 'ok', 'document': None, 'rev': changes.rev, 'objects': []}
+        changes.activate(doc.Name)
+        return {'status': 'ok', 'document': doc.Name, 'rev': changes.rev, 'objects': document_tree(doc)}
+
+    def run(self, request):
+        return self.send_to_gui()
+
+
+class GetDocumentChanges(ActionController):
+    """
+    Objects created, changed or deleted in the active document since a
+    revision: /document/changes?since=rev. If the revision is too old or the
+    active document changed, reset is true and the tree must be reloaded.
+    """
+
+    allow_get = True
+
+    def coalesce_key(self, args):
+        return ('document-changes', args[0])
+
+    def run_gui(self, args):
+        doc = App.ActiveDocument
+        changes = document_observer.changes
+        changes.activate(doc.Name if doc else None)
+        rev, state = changes.changes(doc.Name if doc else None, args[0])
+        if not doc or state is None:
+            return {'status': 'ok', 'document': doc.Name if doc else None, 'rev': rev, 'reset': True}
+        created, changed, deleted = [], [], []
+        for name, kind in state.items():
+            obj = doc.getObject(name) if kind != DELETED else None
+            if obj is None:
+                deleted.append(name)
+            else:
+                (created if kind == CREATED else changed).append(object_data(obj))
+        return {
+            'status': 'ok',
+            'document': doc.Name,
+            'rev': rev,
+            'reset': False,
+            'created': created,
+            'changed': changed,
+            'deleted': deleted,
+        }
+
+    def run(self, request):
+        since = parse_qs(urlsplit(request.path).query).get('since', [None])[0]
+        try:
+            since = int(since)
+        except (TypeError, ValueError):
+            raise BadRequestError(tr("Invalid revision: {}").format(since))
+        return self.send_to_gui(since)
+
+
+class MoveCamera:
+    """
+    Camera gestures, the body is json with any of:
+    {"rotate": [x, y, z] degrees, "pan": [x, y] percent of the view,
+     "zoom": steps, "center": true}
+    Deltas are accumulated and applied once per frame, the request does not
+    wait for the Gui thread.
+    """
+
+    def run(self, request):
+        try:
+            data = json.loads(request.body.decode('utf-8') or '{}')
+            rotate = [float(v) for v in data.get('rotate', ())]
+            pan = [float(v) for v in data.get('pan', ())]
+            zoom = int(data.get('zoom', 0))
+            center = bool(data.get('center', False))
+        except (ValueError, TypeError, AttributeError) as ex:
+            raise BadRequestError(tr("Invalid camera input: {}").format(ex))
+        camera_input.add(rotate, pan, zoom, center)
+        return {'status': 'ok'}
+
+
+class GetEvents:
+    """
+    Long poll: answers as soon as there are events after `since`, or after
+    EVENTS_TIMEOUT seconds. Only a quarter of the workers can be waiting here,
+    other clients get an immediate answer and poll again.
+    """
+
+    allow_get = True
+
+    def run(self, request):
+        query = parse_qs(urlsplit(request.path).query)
+        try:
+            since = int(query.get('since', ['0'])[0])
+        except ValueError:
+            since = 0
+        slots = request.server.event_slots
+        waiting = slots.acquire(blocking=False)
+        try:
+            events, seq, reset = event_bus.since(since, EVENTS_TIMEOUT if waiting else 0)
+        finally:
+            if waiting:
+                slots.release()
+        return {'status': 'ok', 'seq': seq, 'events': events, 'reset': reset}
+
+
+class StreamEvents:
+    """
+    Server-Sent Events: /events/stream?since=N. The connection is detached
+    from the worker and served by the server streamer.
+    """
+
+    allow_get = True
+
+    def run(self, request):
+        since = request.headers.get('Last-Event-ID', None)
+        if since is None:
+            since = parse_qs(urlsplit(request.path).query).get('since', ['-1'])[0]
+        try:
+            since = int(since)
+        except ValueError:
+            since = -1
+        request.wfile.flush()
+        if not request.server.streamer.attach(request.connection, since):
+            raise ServerBusyError(tr("Too many event streams"))
+        request.detach()
+
+
+class StreamView:
+    """
+    MJPEG stream of the active 3D view: /view/stream?w=640&h=480&fps=10.
+    Frames fit in w x h and are only sent when the view changed.
+    """
+
+    allow_get = True
+
+    def run(self, request):
+        query = parse_qs(urlsplit(request.path).query)
+        width = query_int(query, 'w', 640, 64, 4096)
+        height = query_int(query, 'h', 480, 64, 4096)
+        fps = query_int(query, 'fps', MAX_FPS, 1, MAX_FPS)
+        request.wfile.flush()
+        if not request.server.view_streamer.attach(request.connection, width, height, fps):
+            raise ServerBusyError(tr("Too many view streams"))
+        request.detach()
+
+
+def query_int(query, name, default, min_value, max_value):
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        value = default
+    return max(min_value, min(max_value, value))
+
+
+class GetStats:
+
+    def run(self, request):
+        return {
+            'routes': router.stats(),
+            'prewarm': prewarm_task.status() if prewarm_task else None,
+            'icons': icon_cache.stats(),
+            'exports': exports.stats(),
+            'macros': macro_runner.stats(),
+            'queue': gui_queue.stats(),
+            'streams': request.server.streamer.stats(),
+            'view': request.server.view_streamer.stats(),
+            'idle': request.server.idle.stats(),
+            'camera': camera_input.stats(),
+        }
+
+
+class Route:
+
+    def __init__(self, pattern, ctrl):
+        self.pattern = pattern
+        self.ctrl = ctrl
+        self.hits = 0
 
 
 class Router:
+    """
+    Routes are exact paths or prefixes ending in '/'. A prefix route receives
+    the rest of the path as its only parameter. Dispatch is a dict lookup.
+    """
 
     routes = {
         '/workbenches': GetWorkbenches(),
-        '/workbench/(.*)': ActivateWorkbench(),
-        '/workbench-actions/(.*)': GetWorkbenchActions(),
+        '/workbench/': ActivateWorkbench(),
+        '/workbench-actions/': GetWorkbenchActions(),
         '/macros': GetMacros(),
-        '/macro/(.*)': RunMacro(),
-        '/action/(.*)': RunCommand(),
+        '/documents': GetDocuments(),
+        '/open-document/': OpenDocument(),
+        '/macro/': RunMacro(),
+        '/action/': RunCommand(),
+        '/batch': RunBatch(),
+        '/icons/': GetIconBundle(),
+        '/document/tree': GetDocumentTree(),
+        '/document/changes': GetDocumentChanges(),
+        '/camera': MoveCamera(),
+        '/events': GetEvents(),
+        '/events/stream': StreamEvents(),
+        '/view/stream': StreamView(),
+        '/stats': GetStats(),
     }
 
-    def get(self, path):
-        for key, inst in Router.routes.items():
-            match = re.match(key, path)
-            if match:
-                return inst
+    def __init__(self):
+        self.table = {pattern: Route(pattern, ctrl) for pattern, ctrl in Router.routes.items()}
+        self.lock = threading.Lock()
+
+    def lookup(self, path):
+        """Returns (route, args) or (None, ())"""
+        path = path.split('?', 1)[0]
+        route = self.table.get(path, None)
+        if route:
+            return route, ()
+        head, sep, param = path[1:].partition('/')
+        if sep:
+            route = self.table.get('/' + head + '/', None)
+            if route:
+                return route, (unquote(param),)
+        return None, ()
+
+    def dispatch(self, path, accept=None):
+        """Returns (controller, args) or (None, ()) and counts the hit"""
+        route, args = self.lookup(path)
+        if not route or (accept and not accept(route.ctrl)):
+            return None, ()
+        with self.lock:
+            route.hits += 1
+        return route.ctrl, args
+
+    def stats(self):
+        with self.lock:
+            return {r.pattern: r.hits for r in self.table.values()}
 
 
 
 router = Router()
+
+BATCH_STEPS = {
+    'workbench': Router.routes['/workbench/'],
+    'action': Router.routes['/action/'],
+    'macro': Router.routes['/macro/'],
+}
 main_thread = None
+cache_watcher = None
+prewarm_task = None
+macro_watcher = None
+
+
+def watch_pages():
+    """Rebuild cached pages when workbenches, toolbars or recent files change"""
+    global cache_watcher
+    cache_watcher = cache.CacheWatcher(page_cache, Gui.getMainWindow())
+    cache_watcher.watch(workbenches.workbenches_signature, lambda key: key == '/workbenches')
+    cache_watcher.watch(workbenches.toolbars_signature, lambda key: key.startswith('/workbench-actions/'))
+    cache_watcher.watch(documents.recent_files_signature, lambda key: key == '/documents')
+    cache_watcher.start()
+
+
+def on_macro_changed(change, path, entry):
+    """Push a single macro tile to the clients and rebuild the macros page"""
+    if entry:
+        macro = macros.MacroWrapper(Path(path), entry['name'], entry['icon'])
+        action = macros.macro_action(macro).data()
+    else:
+        action = {'action': '/macro/{}'.format(exports.get_macro_key(path))}
+        exports.remove_exported_macro(path)
+    page_cache.invalidate(lambda key: key == '/macros')
+    event_bus.publish('macro', change=change, page='/macros', action=action)
+
+
+def watch_macros():
+    global macro_watcher
+    macro_watcher = MacroWatcher(on_macro_changed, Gui.getMainWindow())
+    macro_watcher.start(macros.get_macro_dir())
+
+
+def on_workbench_activated(name):
+    event_bus.publish('workbench', name=name)
+
+
+def watch_gui():
+    """Publish workbench and document events for remote clients"""
+    Gui.getMainWindow().workbenchActivated.connect(on_workbench_activated)
+    App.addDocumentObserver(document_observer)
 
 
 def start_remote_server():
-    global main_thread
+    global main_thread, prewarm_task
     if not main_thread:
         main_thread = ServerThread()
         main_thread.start()
+        watch_pages()
+        watch_macros()
+        watch_gui()
+        if preferences.get_mnesarco_pref('Remote', 'Prewarm', kind=bool, default=False):
+            prewarm_task = prewarm.Prewarm(page_cache, page_bundle)
+            prewarm_task.start()
     ip = networking.get_local_ip()
     if ip:
         address = "http://{}:{}".format(ip, preferences.get_mnesarco_pref('Remote', 'Port', kind=int, default=8521))
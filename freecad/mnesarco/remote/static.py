@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import gzip, threading
+from collections import OrderedDict
+
+# Exported files are versioned by their key, clients can keep them forever
+CACHE_IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Everything else must be revalidated (ETag) on each use
+CACHE_REVALIDATE = 'no-cache'
+
+COMPRESSIBLE_TYPES = (
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+)
+
+GZIP_MIN_SIZE = 512
+GZIP_CACHE_SIZE = 256
+
+
+def file_etag(st):
+    """Weak identity of a file from its stat result"""
+    return '"{:x}-{:x}"'.format(st.st_mtime_ns, st.st_size)
+
+
+def etag_matches(etag, if_none_match):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = (t.strip() for t in if_none_match.split(','))
+    return any(t == etag or t == 'W/' + etag for t in tags)
+
+
+def is_compressible(ctype, size):
+    if size < GZIP_MIN_SIZE:
+        return False
+    ctype = ctype.split(';', 1)[0].strip()
+    return ctype.startswith('text/') or ctype in COMPRESSIBLE_TYPES
+
+
+def accepts_gzip(headers):
+    return 'gzip' in (headers.get('Accept-Encoding', None) or '')
+
+
+class GzipCache:
+    """LRU of compressed file contents, keyed by path and validated by etag"""
+
+    def __init__(self, capacity=GZIP_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path, etag):
+        with self.lock:
+            entry = self.entries.get(path, None)
+            if entry and entry[0] == etag:
+                self.entries.move_to_end(path)
+                return entry[1]
+        with open(path, 'rb') as f:
+            data = gzip.compress(f.read(), compresslevel=6)
+        with self.lock:
+            self.entries[path] = (etag, data)
+            self.entries.move_to_end(path)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        return data
+
+
+gzip_cache = GzipCache()
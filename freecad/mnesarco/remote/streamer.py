@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import json, threading
+from freecad.mnesarco.utils.extension import def_log_err
+
+log_err = def_log_err('Remote')
+
+MAX_STREAMS = 32
+
+# Seconds between keep alive comments, also detects closed connections
+HEARTBEAT = 15
+
+# Seconds a slow client can block a write before it is dropped
+SEND_TIMEOUT = 2
+
+HEADERS = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: text/event-stream\r\n"
+    b"Cache-Control: no-store\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+    b"retry: 3000\n\n"
+)
+
+
+def frame(event):
+    return 'id: {}\ndata: {}\n\n'.format(event['seq'], json.dumps(event, separators=(',', ':'))).encode()
+
+
+def reset_frame(seq):
+    return 'id: {}\nevent: reset\ndata: {{}}\n\n'.format(seq).encode()
+
+
+class Stream:
+
+    def __init__(self, sock, seq):
+        self.sock = sock
+        self.seq = seq
+
+
+class EventStreamer(threading.Thread):
+    """
+    Server-Sent Events for all connected clients from a single thread. The
+    sockets are detached from the http workers once the stream is open, so
+    an idle client does not hold a worker.
+    """
+
+    def __init__(self, bus, capacity=MAX_STREAMS):
+        super(EventStreamer, self).__init__(name='RemoteEvents', daemon=True)
+        self.bus = bus
+        self.capacity = capacity
+        self.streams = []
+        self.lock = threading.Lock()
+        self.running = False
+        self.seq = 0
+        self.sent = 0
+        self.dropped = 0
+
+    def full(self):
+        with self.lock:
+            return len(self.streams) >= self.capacity
+
+    def attach(self, sock, since):
+        """
+        Opens the stream on sock (http worker thread) and takes ownership of
+        it. Returns False if there is no room for another stream.
+        """
+        with self.lock:
+            if len(self.streams) >= self.capacity:
+                return False
+            if not self.running:
+                self.running = True
+                self.seq = self.bus.since(-1)[1]
+                self.start()
+            events, seq, reset = self.bus.since(since)
+            data = HEADERS
+            if reset:
+                data += reset_frame(seq)
+            else:
+                data += b''.join(frame(e) for e in events)
+            try:
+                sock.settimeout(SEND_TIMEOUT)
+                sock.sendall(data)
+            except OSError:
+                self.close_socket(sock)
+                return True
+            self.streams.append(Stream(sock, seq))
+            return True
+
+    def run(self):
+        while self.running:
+            events, seq, reset = self.bus.since(self.seq, HEARTBEAT)
+            with self.lock:
+                if reset:
+                    self.broadcast(lambda stream: reset_frame(seq))
+                elif events:
+                    self.broadcast(lambda stream: b''.join(frame(e) for e in events if e['seq'] > stream.seq))
+                else:
+                    self.broadcast(lambda stream: b': ping\n\n')
+                for stream in self.streams:
+                    stream.seq = max(stream.seq, seq)
+            self.seq = seq
+
+    def broadcast(self, make_data):
+        """Must be called with the lock held"""
+        alive = []
+        for stream in self.streams:
+            data = make_data(stream)
+            try:
+                if data:
+                    stream.sock.sendall(data)
+                    self.sent += 1
+                alive.append(stream)
+            except OSError:
+                self.dropped += 1
+                self.close_socket(stream.sock)
+        self.streams = alive
+
+    def close_socket(self, sock):
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def close(self):
+        with self.lock:
+            self.running = False
+            for stream in self.streams:
+                self.close_socket(stream.sock)
+            self.streams = []
+
+    def stats(self):
+        with self.lock:
+            return {
+                'streams': len(self.streams),
+                'capacity': self.capacity,
+                'sent': self.sent,
+                'dropped': self.dropped,
+            }
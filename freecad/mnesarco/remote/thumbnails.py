@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import hashlib, mmap, os, struct, threading, zipfile, zlib
+from pathlib import Path
+from freecad.mnesarco.utils.files import user_cache_dir
+
+THUMBNAIL_MEMBER = b'thumbnails/Thumbnail.png'
+
+# Zip records: end of central directory, central directory entry, local header
+END_RECORD = struct.Struct('<4s4H2LH')
+DIR_ENTRY = struct.Struct('<4s6H3L5H2L')
+LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+MAX_COMMENT = 0xFFFF
+ZIP64_MARK = 0xFFFFFFFF
+
+
+class _UnsupportedZip(Exception):
+    """Archive feature not handled by the fast reader, use zipfile instead"""
+
+
+def find_member(mm, name):
+    """(method, crc, compressed size, local header offset) of name, None if missing"""
+    start = max(0, len(mm) - END_RECORD.size - MAX_COMMENT)
+    pos = mm.rfind(b'PK\x05\x06', start)
+    if pos < 0:
+        raise zipfile.BadZipFile("End of central directory not found")
+    _, _, _, _, count, _, offset, _ = END_RECORD.unpack_from(mm, pos)
+    if offset == ZIP64_MARK:
+        raise _UnsupportedZip("zip64")
+    for _ in range(count):
+        entry = DIR_ENTRY.unpack_from(mm, offset)
+        if entry[0] != b'PK\x01\x02':
+            raise zipfile.BadZipFile("Invalid central directory")
+        name_len, extra_len, comment_len = entry[10:13]
+        if mm[offset + DIR_ENTRY.size:offset + DIR_ENTRY.size + name_len] == name:
+            return entry[4], entry[7], entry[8], entry[16]
+        offset += DIR_ENTRY.size + name_len + extra_len + comment_len
+    return None
+
+
+def read_member(mm, name):
+    member = find_member(mm, name)
+    if not member:
+        return None
+    method, crc, size, offset = member
+    header = LOCAL_HEADER.unpack_from(mm, offset)
+    if header[0] != b'PK\x03\x04':
+        raise zipfile.BadZipFile("Invalid local header")
+    start = offset + LOCAL_HEADER.size + header[9] + header[10]
+    data = mm[start:start + size]
+    if method == zipfile.ZIP_DEFLATED:
+        data = zlib.decompress(data, -15)
+    elif method != zipfile.ZIP_STORED:
+        raise _UnsupportedZip("compression method {}".format(method))
+    if zlib.crc32(data) != crc:
+        raise zipfile.BadZipFile("Bad crc")
+    return data
+
+
+def read_thumbnail(path):
+    """
+    Embedded png of a FCStd file, None if it has no thumbnail. Only the
+    central directory and the thumbnail entry of the mapped file are read,
+    Document.xml and the brep files are never touched.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            try:
+                return read_member(mm, THUMBNAIL_MEMBER)
+            except _UnsupportedZip:
+                pass
+        # zip64 and unusual archives
+        try:
+            with zipfile.ZipFile(f) as archive:
+                return archive.read(THUMBNAIL_MEMBER.decode())
+        except KeyError:
+            return None
+
+
+class ThumbnailCache:
+    """
+    Document thumbnails extracted once to png files named by path, mtime and
+    size. Previous versions of the same document are removed.
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root) if root else None
+        self.missing = set()
+        self.lock = threading.Lock()
+
+    def file_name(self, path, st):
+        prefix = hashlib.sha1(str(path).encode('utf-8')).hexdigest()[:16]
+        version = hashlib.sha1('{}:{}'.format(st.st_mtime_ns, st.st_size).encode()).hexdigest()[:8]
+        return prefix, '{}-{}.png'.format(prefix, version)
+
+    def get(self, path):
+        """Path of the png thumbnail of the document, or None"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if self.root is None:
+            self.root = user_cache_dir('thumbnails')
+        prefix, name = self.file_name(path, st)
+        file = self.root.joinpath(name)
+        if file.exists():
+            return file
+        with self.lock:
+            if name in self.missing:
+                return None
+            try:
+                data = read_thumbnail(path)
+            except (OSError, ValueError, struct.error, zipfile.BadZipFile, zlib.error):
+                data = None
+            if not data:
+                self.missing.add(name)
+                return None
+            for old in self.root.glob(prefix + '-*.png'):
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
+            tmp = file.with_suffix('.tmp')
+            tmp.write_bytes(data)
+            os.replace(tmp, file)
+            return file
+
+
+thumbnail_cache = ThumbnailCache()
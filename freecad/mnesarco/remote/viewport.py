@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Mnesarco Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import threading, time, zlib
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from freecad.mnesarco.utils.qt import QtCore
+from freecad.mnesarco.remote import gui_queue as gq
+
+MAX_FPS = 10
+MAX_VIEW_STREAMS = 4
+JPEG_QUALITY = 75
+
+# Seconds between frames of an unchanged view, detects closed connections
+KEEPALIVE = 10
+
+# Seconds to wait for a capture or a socket write
+CAPTURE_TIMEOUT = 2
+SEND_TIMEOUT = 2
+
+HEADERS = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: multipart/x-mixed-replace; boundary=frame\r\n"
+    b"Cache-Control: no-store\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+)
+
+
+def capture():
+    """Grab the active 3D view as a QImage (Gui thread), None if there is no view"""
+    from freecad.mnesarco.utils.graphics import active_view
+    view = active_view()
+    if not view or not hasattr(view, 'graphicsView'):
+        return None
+    widget = view.graphicsView().viewport()
+    if hasattr(widget, 'grabFramebuffer'):
+        image = widget.grabFramebuffer()
+    else:
+        image = widget.grab().toImage()
+    return None if image.isNull() else image
+
+
+def image_hash(image):
+    """Cheap fingerprint of the pixels, crc32 of the raw buffer"""
+    return zlib.crc32(memoryview(image.constBits())[:image.sizeInBytes()])
+
+
+def encode(image, width, height):
+    """JPEG of image fitted into width x height, never upscaled"""
+    if image.width() > width or image.height() > height:
+        image = image.scaled(width, height, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+    data = QtCore.QByteArray()
+    buffer = QtCore.QBuffer(data)
+    buffer.open(QtCore.QIODevice.WriteOnly)
+    image.save(buffer, 'JPEG', JPEG_QUALITY)
+    buffer.close()
+    return bytes(data)
+
+
+def part(jpeg):
+    header = "--frame\r\nContent-Type: image/jpeg\r\nContent-Length: {}\r\n\r\n".format(len(jpeg))
+    return header.encode() + jpeg + b"\r\n"
+
+
+class ViewClient:
+
+    def __init__(self, sock, width, height, fps):
+        self.sock = sock
+        self.size = (width, height)
+        self.interval = 1.0 / fps
+        self.last_tick = 0
+        self.last_sent = 0
+        self.last_hash = None
+
+
+class ViewStreamer:
+    """
+    MJPEG streams of the active 3D view. A single thread captures through the
+    Gui queue (one capture in flight), skips unchanged frames by hash and
+    encodes once per distinct client size, so the Gui thread only grabs.
+    The thread is started again by the next attach if it ever stops.
+    """
+
+    def __init__(self, queue, capacity=MAX_VIEW_STREAMS):
+        self.queue = queue
+        self.thread = None
+        self.capacity = capacity
+        self.clients = []
+        self.cond = threading.Condition()
+        self.running = False
+        self.frame_hash = None
+        self.frames = {}  # size -> jpeg of the current frame
+        self.captured = 0
+        self.skipped = 0
+        self.encoded = 0
+        self.sent = 0
+
+    def attach(self, sock, width, height, fps):
+        """Opens the stream on sock and takes ownership of it, False if full"""
+        with self.cond:
+            if len(self.clients) >= self.capacity:
+                return False
+            try:
+                sock.settimeout(SEND_TIMEOUT)
+                sock.sendall(HEADERS)
+            except OSError:
+                sock.close()
+                return True
+            self.clients.append(ViewClient(sock, width, height, fps))
+            if not self.running:
+                self.running = True
+                self.thread = threading.Thread(target=self.run, name='RemoteView', daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+            return True
+
+    def run(self):
+        try:
+            self.loop()
+        finally:
+            with self.cond:
+                self.running = False
+                for client in list(self.clients):
+                    self.close_client(client)
+
+    def loop(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.clients or not self.running)
+                if not self.running:
+                    return
+                now = time.monotonic()
+                wait = min(c.last_tick + c.interval for c in self.clients) - now
+            if wait > 0:
+                time.sleep(wait)
+            image = self.capture()
+            if image is None:
+                time.sleep(1)
+                continue
+            self.send(image)
+
+    def capture(self):
+        try:
+            future = self.queue.submit(capture, gq.PRIORITY_VIEW, key='viewport')
+        except gq.QueueFullError:
+            return None
+        try:
+            image = future.result(timeout=CAPTURE_TIMEOUT)
+        except FutureTimeoutError:
+            self.queue.release(future)
+            return None
+        except BaseException:
+            # Capture failed in the Gui thread (i.e. the view was closed)
+            return None
+        self.captured += 1
+        return image
+
+    def send(self, image):
+        frame_hash = image_hash(image)
+        if frame_hash != self.frame_hash:
+            self.frame_hash = frame_hash
+            self.frames = {}
+        now = time.monotonic()
+        with self.cond:
+            clients = list(self.clients)
+        dropped = []
+        for client in clients:
+            if now - client.last_tick < client.interval:
+                continue
+            client.last_tick = now
+            if client.last_hash == frame_hash and now - client.last_sent < KEEPALIVE:
+                self.skipped += 1
+                continue
+            jpeg = self.frames.get(client.size, None)
+            if jpeg is None:
+                jpeg = self.frames[client.size] = encode(image, *client.size)
+                self.encoded += 1
+            try:
+                client.sock.sendall(part(jpeg))
+                client.last_sent = now
+                client.last_hash = frame_hash
+                self.sent += 1
+            except OSError:
+                dropped.append(client)
+        if dropped:
+            with self.cond:
+                for client in dropped:
+                    self.close_client(client)
+
+    def close_client(self, client):
+        """Must be called with the lock held"""
+        if client in self.clients:
+            self.clients.remove(client)
+        try:
+            client.sock.close()
+        except OSError:
+            pass
+
+    def close(self):
+        with self.cond:
+            self.running = False
+            for client in list(self.clients):
+                self.close_client(client)
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {
+                'streams': len(self.clients),
+                'capacity': self.capacity,
+                'captured': self.captured,
+                'skipped': self.skipped,
+                'encoded': self.encoded,
+                'sent': self.sent,
+            }
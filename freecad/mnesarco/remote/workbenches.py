@@ -23,8 +23,10 @@ from freecad.mnesarco.gui import Gui
 from freecad.mnesarco.remote.exports import export_action, export_file
 from freecad.mnesarco.remote import page
 from freecad.mnesarco.resources import tr
+from freecad.mnesarco.utils.icon_cache import icon_cache
 
 excluded = ['NoneWorkbench', 'CompleteWorkbench', 'StartWorkbench']
+excluded_toolbars = ['File', 'Workbench', 'Macro', 'View', 'Structure']
 
 
 class WorkbenchWrapper:
@@ -38,9 +40,9 @@ class WorkbenchWrapper:
             icon = self.wb.Icon
             if icon:
                 if icon.find('XPM') >= 0:
-                    icon = export_file(qt.pixmap_to_png(icon))
+                    icon = export_icon(icon_cache.xpm(icon, page.ICON_SIZE))
                 else:
-                    icon = export_file(icon)
+                    icon = export_icon(icon_cache.file(icon, page.ICON_SIZE))
             else:
                 icon = "img/noicon.svg"
         else:    
@@ -78,24 +80,38 @@ class WorkbenchPage(page.Page):
         return "css/compact.css"
 
     def sections(self):
+        return list(self.iter_sections())
+
+    def iter_sections(self):
+        """Build sections one toolbar at a time"""
         self.wb = WorkbenchWrapper(Gui.listWorkbenches()[self.key], self.key)
         mw = Gui.getMainWindow()
-        excluded = ['File', 'Workbench', 'Macro', 'View', 'Structure']
-        sections = []
         for name in self.wb.wb.listToolbars():
-            if name in excluded:
+            if name in excluded_toolbars:
                 continue            
             toolbar = mw.findChildren(qt.QtGui.QToolBar, name)
+            if not toolbar:
+                continue
+            buttons = [b for b in toolbar[0].findChildren(qt.QtGui.QToolButton) if b.text() != '']
+            qactions = [b.defaultAction() for b in buttons]
+            icons = icon_cache.actions(qactions, page.ICON_SIZE, scales=(1, 2))
             actions = []
-            for button in toolbar[0].findChildren(qt.QtGui.QToolButton):
-                if button.text() == '': continue
-                qaction = button.defaultAction()
+            for qaction, icon in zip(qactions, icons):
                 key = export_action(name, qaction)
-                actions.append(page.Action(qaction.iconText(), export_file(qt.extract_action_pixmap(qaction, 64)), '/action/{}'.format(key)))
+                actions.append(page.Action(
+                    qaction.iconText(), 
+                    export_icon(icon[1]), 
+                    '/action/{}'.format(key),
+                    icon2x=export_icon(icon[2])))
             if actions:
-                sections.append(page.Section(name, actions))
-        return sections
+                yield page.Section(name, actions)
+
+
 
+def export_icon(path):
+    if path:
+        return export_file(path)
+    return "img/noicon.svg"
 
 
 def get_all_workbenches():
@@ -107,4 +123,23 @@ def get_all_workbenches():
             icon = wb.get_icon()
             text = wb.get_text() or key
             actions.append(page.Action(text, icon, '/workbench/{}'.format(wb.key)))
-    return actions
\ No newline at end of file
+    return actions
+
+
+def workbenches_signature():
+    return sorted(Gui.listWorkbenches())
+
+
+def toolbars_signature():
+    mw = Gui.getMainWindow()
+    return sorted((tb.objectName(), len(tb.actions())) for tb in mw.findChildren(qt.QtGui.QToolBar))
+
+
+def is_loaded(key):
+    """True if the toolbars of the workbench already exist in the main window"""
+    try:
+        names = [n for n in Gui.listWorkbenches()[key].listToolbars() if n not in excluded_toolbars]
+    except BaseException:
+        return False
+    existing = set(tb.objectName() for tb in Gui.getMainWindow().findChildren(qt.QtGui.QToolBar))
+    return bool(names) and all(n in existing for n in names)
@@ -20,17 +20,24 @@
 
 var pageCacheCount = 0;
 var pageCache = {}; // CachedPage { id, stylesheet }
+var pendingPages = {};
 var textLengthThreshold = 18;
 var navHistory = [];
+var eventSeq = -1;
+var busyRetries = 3;
 
 
 function fcInit() {
     setTimeout(loadAllWorkbenches, 50);
+    setTimeout(listenEvents, 100);
     initNoSleep();
     window.loadedWorkbenches = {};
     document.querySelector("#btn-all-workbenches").addEventListener("click", loadAllWorkbenches, false);
     document.querySelector("#btn-all-macros").addEventListener("click", loadAllMacros, false);
+    document.querySelector("#btn-documents").addEventListener("click", loadRecentDocuments, false);
     document.querySelector("#btn-back").addEventListener("click", historyBack, false);
+    document.querySelector("#btn-view").addEventListener("click", toggleView, false);
+    initCameraGestures(document.querySelector("#fc-view img"));
 }
 
 
@@ -44,6 +51,11 @@ function loadAllMacros() {
 }
 
 
+function loadRecentDocuments() {
+    getPage('/documents');
+}
+
+
 function onWorkbenchActivated(action, data) {
     getPage('/workbench-actions/' + data.workbench);
 }
@@ -84,10 +96,15 @@ function Button(text, icon, action, onCompleted) {
     var label = document.createElement('span');
     label.innerHTML = text;
     group.title = text;
+    group.dataset.action = action;
     group.appendChild(img);
     group.appendChild(label);
     var handler = function(a, d) {
         img.src = icon;
+        if (d.status !== 'ok') {
+            showFailed(group, d.message || d.status);
+            return;
+        }
         if (onCompleted) {
             onCompleted(a, d);
         }
@@ -100,7 +117,7 @@ function Button(text, icon, action, onCompleted) {
 }
 
 
-function PageSection(section, withHeader, root, onActionCompleted) {
+function PageSection(section, withHeader, root, onActionCompleted, icons) {
     if (withHeader) {
         var header = document.createElement('div');
         header.classList.add('section-header');
@@ -109,7 +126,7 @@ function PageSection(section, withHeader, root, onActionCompleted) {
     }
     for (var i=0; i<section.actions.length; i++) {
         var data = section.actions[i];
-        root.appendChild(Button(data.title, data.icon, data.action, onActionCompleted));
+        root.appendChild(Button(data.title, icons[data.icon] || data.icon, data.action, onActionCompleted));
     }
 }
 
@@ -128,17 +145,31 @@ function setCachedPage(url) {
 
 
 function getPage(url, onActionCompleted) {    
-    if (!setCachedPage(url)) {
-        fetch(url, {method: 'POST', mode: 'same-origin'})
-            .then(function(r) { return r.json(); })
-            .then(function(page) { 
-                setPage(url, page, onActionCompleted); 
+    if (!setCachedPage(url) && !pendingPages[url]) {
+        pendingPages[url] = true;
+        var page = fetchJson(url, {method: 'GET', mode: 'same-origin'});
+        var icons = getIconBundle(url);
+        Promise.all([page, icons])
+            .then(function(result) { 
+                if (result[0].sections) {
+                    setPage(url, result[0], onActionCompleted, result[1]); 
+                }
             })
+            .finally(function() { delete pendingPages[url]; });
     }
 }
 
 
-function setPage(url, page, onActionCompleted) {
+function getIconBundle(url) {
+    var scale = window.devicePixelRatio > 1.5 ? '?scale=2' : '';
+    return fetch('/icons' + url + scale, {method: 'GET', mode: 'same-origin'})
+        .then(function(r) { return r.json(); })
+        .then(function(bundle) { return bundle.icons || {}; })
+        .catch(function() { return {}; });
+}
+
+
+function setPage(url, page, onActionCompleted, icons) {
     clearRoot();
     document.querySelector("#stylesheet").href = page.stylesheet;
     var pageId = 'cached-page-' + (pageCacheCount++);
@@ -147,11 +178,12 @@ function setPage(url, page, onActionCompleted) {
     el.id = pageId;
     var singleSection = page.sections.length === 1;
     for (var s = 0; s < page.sections.length; s++) {
-        PageSection(page.sections[s], !singleSection, el, onActionCompleted);
+        PageSection(page.sections[s], !singleSection, el, onActionCompleted, icons || {});
     }
     pageCache[url] = {
         id: pageId,
-        stylesheet: page.stylesheet
+        stylesheet: page.stylesheet,
+        onActionCompleted: onActionCompleted
     };
     var fcRoot = document.querySelector('#fc-root');
     fcRoot.appendChild(el);
@@ -159,10 +191,35 @@ function setPage(url, page, onActionCompleted) {
 }
 
 
+function showFailed(el, message) {
+    var title = el.title;
+    el.classList.add('failed');
+    el.title = message;
+    setTimeout(function() {
+        el.classList.remove('failed');
+        el.title = title;
+    }, 2000);
+}
+
+
+function fetchJson(url, options, retries) {
+    // Busy server (429/503): wait Retry-After seconds and try again
+    retries = retries || 0;
+    return fetch(url, options).then(function(r) {
+        if ((r.status === 429 || r.status === 503) && retries < busyRetries) {
+            var delay = (parseFloat(r.headers.get('Retry-After')) || 1) * 1000;
+            return new Promise(function(resolve) { setTimeout(resolve, delay); })
+                .then(function() { return fetchJson(url, options, retries + 1); });
+        }
+        return r.json();
+    });
+}
+
+
 function sendAction(action, onCompleted) {
     setTimeout(function() {
-        fetch(action, {method: 'POST', mode: 'same-origin'})
-            .then(function(r) { return r.json(); })
+        fetchJson(action, {method: 'POST', mode: 'same-origin'})
+            .catch(function(ex) { return {status: 'error', message: String(ex)}; })
             .then(function(data) { 
                 if (onCompleted) {
                     onCompleted(action, data);
@@ -172,6 +229,223 @@ function sendAction(action, onCompleted) {
 }
 
 
+function sendBatch(steps, recompute, onCompleted) {
+    var body = JSON.stringify({steps: steps, recompute: !!recompute});
+    fetchJson('/batch', {method: 'POST', mode: 'same-origin', body: body})
+        .then(function(data) {
+            if (onCompleted) {
+                onCompleted('/batch', data);
+            }
+        });
+}
+
+
+function listenEvents() {
+    if (!window.EventSource) {
+        pollEvents();
+        return;
+    }
+    var source = new EventSource('/events/stream?since=' + eventSeq);
+    source.onmessage = function(e) {
+        var event = JSON.parse(e.data);
+        eventSeq = event.seq;
+        onEvent(event);
+    };
+    source.addEventListener('reset', function(e) {
+        onEventsLost();
+        eventSeq = parseInt(e.lastEventId, 10);
+    });
+    source.onerror = function() {
+        // Closed for good (i.e. too many streams), poll instead
+        if (source.readyState === EventSource.CLOSED) {
+            pollEvents();
+        }
+    };
+}
+
+
+function pollEvents() {
+    fetch('/events?since=' + eventSeq, {method: 'GET', mode: 'same-origin', cache: 'no-store'})
+        .then(function(r) { return r.json(); })
+        .then(function(data) {
+            if (data.reset) {
+                onEventsLost();
+            }
+            eventSeq = data.seq;
+            for (var i = 0; i < data.events.length; i++) {
+                onEvent(data.events[i]);
+            }
+            setTimeout(pollEvents, 10);
+        })
+        .catch(function() { setTimeout(pollEvents, 5000); });
+}
+
+
+function onEvent(event) {
+    if (event.type === 'macro') {
+        updatePageButton(event.page, event.change, event.action);
+    }
+    else if (event.type === 'workbench') {
+        // Follow workbench changes made in FreeCAD or by other clients,
+        // only while a workbench is shown, other pages are left alone
+        var current = navHistory[navHistory.length - 1] || '';
+        var target = '/workbench-actions/' + event.name;
+        if (current.indexOf('/workbench-actions/') === 0 && current !== target) {
+            getPage(target);
+        }
+    }
+}
+
+
+function onEventsLost() {
+    // Cached pages may be outdated, reload them on next visit
+    var current = navHistory[navHistory.length - 1];
+    for (var url in pageCache) {
+        if (url !== current) {
+            var el = document.querySelector('#' + pageCache[url].id);
+            el.parentNode.removeChild(el);
+            delete pageCache[url];
+        }
+    }
+}
+
+
+function updatePageButton(url, change, data) {
+    var cache = pageCache[url];
+    if (!cache) {
+        return;
+    }
+    var el = document.querySelector('#' + cache.id);
+    var current = null;
+    var buttons = el.querySelectorAll('[data-action]');
+    for (var i = 0; i < buttons.length; i++) {
+        if (buttons[i].dataset.action === data.action) {
+            current = buttons[i];
+            break;
+        }
+    }
+    if (change === 'removed') {
+        if (current) {
+            el.removeChild(current);
+        }
+        return;
+    }
+    var button = Button(data.title, data.icon, data.action, cache.onActionCompleted);
+    if (current) {
+        el.replaceChild(button, current);
+    }
+    else {
+        el.appendChild(button);
+    }
+}
+
+
+function toggleView() {
+    var view = document.querySelector('#fc-view');
+    var img = view.querySelector('img');
+    if (view.style.display === 'block') {
+        // Dropping the source closes the stream
+        img.removeAttribute('src');
+        view.style.display = 'none';
+        return;
+    }
+    view.style.display = 'block';
+    var scale = window.devicePixelRatio || 1;
+    var width = Math.round(view.clientWidth * scale);
+    var height = Math.round(window.innerHeight * 0.5 * scale);
+    img.src = '/view/stream?w=' + width + '&h=' + height + '&t=' + Date.now();
+}
+
+
+var cameraPending = null;
+var cameraBusy = false;
+
+
+function sendCamera(input) {
+    // Merge inputs while a request is in flight, the server merges the rest
+    var p = cameraPending || {rotate: [0, 0, 0], pan: [0, 0], zoom: 0, center: false};
+    for (var i = 0; i < 3; i++) {
+        p.rotate[i] += (input.rotate || [0, 0, 0])[i] || 0;
+    }
+    for (var j = 0; j < 2; j++) {
+        p.pan[j] += (input.pan || [0, 0])[j] || 0;
+    }
+    p.zoom += input.zoom || 0;
+    p.center = p.center || !!input.center;
+    cameraPending = p;
+    if (!cameraBusy) {
+        flushCamera();
+    }
+}
+
+
+function flushCamera() {
+    if (!cameraPending) {
+        cameraBusy = false;
+        return;
+    }
+    var body = JSON.stringify(cameraPending);
+    cameraPending = null;
+    cameraBusy = true;
+    fetch('/camera', {method: 'POST', mode: 'same-origin', body: body})
+        .catch(function() {})
+        .then(flushCamera);
+}
+
+
+function initCameraGestures(el) {
+    var pointers = {};
+    var pinch = null;
+    var degreesPerPixel = 0.5;
+    var pixelsPerZoomStep = 40;
+
+    function midpoint() {
+        var ids = Object.keys(pointers);
+        var a = pointers[ids[0]], b = pointers[ids[1]];
+        return {
+            x: (a.x + b.x) / 2,
+            y: (a.y + b.y) / 2,
+            d: Math.sqrt((a.x - b.x) * (a.x - b.x) + (a.y - b.y) * (a.y - b.y))
+        };
+    }
+
+    el.addEventListener('pointerdown', function(e) {
+        el.setPointerCapture(e.pointerId);
+        pointers[e.pointerId] = {x: e.clientX, y: e.clientY};
+        pinch = Object.keys(pointers).length === 2 ? midpoint() : null;
+    });
+    el.addEventListener('pointermove', function(e) {
+        var last = pointers[e.pointerId];
+        if (!last) {
+            return;
+        }
+        var count = Object.keys(pointers).length;
+        if (count === 1) {
+            sendCamera({rotate: [(e.clientY - last.y) * degreesPerPixel, (e.clientX - last.x) * degreesPerPixel, 0]});
+        }
+        pointers[e.pointerId] = {x: e.clientX, y: e.clientY};
+        if (count === 2 && pinch) {
+            var current = midpoint();
+            var steps = Math.trunc((current.d - pinch.d) / pixelsPerZoomStep);
+            sendCamera({
+                pan: [(current.x - pinch.x) / el.clientWidth * 100, (pinch.y - current.y) / el.clientHeight * 100],
+                zoom: steps
+            });
+            pinch = {x: current.x, y: current.y, d: pinch.d + steps * pixelsPerZoomStep};
+        }
+    });
+    var release = function(e) {
+        delete pointers[e.pointerId];
+        pinch = null;
+    };
+    el.addEventListener('pointerup', release);
+    el.addEventListener('pointercancel', release);
+    el.addEventListener('dblclick', function() {
+        sendCamera({center: true});
+    });
+}
+
+
 function initNoSleep() {
     var noSleep = new NoSleep();        
     var wakeLockEnabled = false;
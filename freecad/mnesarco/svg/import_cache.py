@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+#
+# This file is part of Mnesarco Utils.
+#
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import hashlib, os, tempfile
+import xml.sax
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Callable, Dict, Tuple
+
+import FreeCAD as App  # type: ignore
+import importSVG as svg  # type: ignore
+import Part  # type: ignore
+
+from freecad.mnesarco.utils.extension import def_log
+from .parser import Group, filter_svg, parse_svg_groups
+
+log_err = def_log('SvgFile')
+
+# Draft preferences read by importSVG
+DRAFT_PARAMS = "User parameter:BaseApp/Preferences/Mod/Draft"
+
+# Imported files kept in memory
+CACHE_SIZE = 4
+
+
+def importer_settings() -> Tuple[Tuple[str, str], ...]:
+    """
+    Draft svg* preferences that change the result of importSVG.
+
+    :return Tuple[Tuple[str, str], ...]: sorted (name, value) pairs
+    """
+    contents = App.ParamGet(DRAFT_PARAMS).GetContents() or []
+    return tuple(sorted((str(name), repr(value)) for _, name, value in contents if str(name).lower().startswith('svg')))
+
+
+def content_key(file_name: str) -> str:
+    """
+    Hash of the svg content and the importer settings.
+
+    :param str file_name: svg file path
+    :return str: sha256 hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    digest.update(repr(importer_settings()).encode())
+    return digest.hexdigest()
+
+
+def import_shapes(file_name: str) -> Dict[str, Part.Shape]:
+    """
+    Import the svg file into a hidden temporal document.
+
+    :param str file_name: svg file path
+    :return Dict[str, Part.Shape]: shapes by imported object name
+    """
+    doc: App.Document = App.newDocument('_svg_import_', hidden=True, temp=True)
+    doc_name = doc.Name
+    try:
+        svg.insert(file_name, doc_name)
+        return {obj.Name: obj.Shape.copy() for obj in doc.Objects if hasattr(obj, 'Shape') and obj.Shape}
+    finally:
+        with suppress(Exception):
+            App.closeDocument(doc_name)
+
+
+def import_selected(file_name: str, keep: Callable[[str], bool]) -> Dict[str, Part.Shape]:
+    """
+    Import only the elements accepted by keep, through a reduced copy of
+    the svg file, so the cost depends on the selection and not on the
+    whole artwork.
+
+    :param str file_name: svg file path
+    :param Callable[[str], bool] keep: id predicate
+    :return Dict[str, Part.Shape]: shapes by imported object name
+    """
+    fd, reduced = tempfile.mkstemp(suffix='.svg')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            filter_svg(file_name, keep, out)
+        return import_shapes(reduced)
+    except xml.sax.SAXException as ex:
+        log_err(f"Svg prefilter failed, importing the whole file: {ex}")
+        return import_shapes(file_name)
+    finally:
+        with suppress(OSError):
+            os.remove(reduced)
+
+
+class SvgImport:
+    """Result of importing one svg content"""
+
+    def __init__(self, shapes: Dict[str, Part.Shape], selection: str = None) -> None:
+        self.shapes = shapes
+        self.selection = selection  # None if the whole file was imported
+        self._groups = None
+
+    def groups(self, file_name: str) -> Dict[str, Group]:
+        """
+        Svg groups, parsed on first use.
+
+        :param str file_name: svg file with the same content
+        :return Dict[str, Group]: groups by xml id
+        """
+        if self._groups is None:
+            self._groups = parse_svg_groups(file_name)
+        return self._groups
+
+
+class ImportCache:
+    """
+    Imported shapes keyed by the sha256 of the svg content and the importer
+    settings, so executions that only change the selection do not import
+    the file again.
+
+    The first import of a content may be selective. It only serves the same
+    selection, a different one imports the whole file once and replaces it.
+    """
+
+    def __init__(self, capacity: int = CACHE_SIZE) -> None:
+        self.capacity = capacity
+        self.entries: Dict[str, SvgImport] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: str, selection: str = None) -> SvgImport | None:
+        entry = self.entries.get(key, None)
+        if entry and entry.selection is not None and entry.selection != selection:
+            entry = None
+        if entry:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return entry
+
+    def store(self, key: str, shapes: Dict[str, Part.Shape], selection: str = None) -> SvgImport:
+        self.misses += 1
+        entry = SvgImport(shapes, selection)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return entry
+
+    def get(self, file_name: str, keep: Callable[[str], bool] = None, keep_key: str = '') -> SvgImport:
+        """
+        Imported shapes of the svg file.
+
+        :param str file_name: svg file path
+        :param Callable[[str], bool] keep: id predicate, None imports everything
+        :param str keep_key: stable identity of keep
+        :return SvgImport: cached or new import
+        """
+        key = content_key(file_name)
+        selection = keep_key if keep is not None else None
+        entry = self.lookup(key, selection)
+        if entry:
+            return entry
+        if keep is None or key in self.entries:
+            # Selection changed (or everything requested): import the whole
+            # file once, later selector edits reuse it
+            return self.store(key, import_shapes(file_name))
+        return self.store(key, import_selected(file_name, keep), selection)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+import_cache = ImportCache()
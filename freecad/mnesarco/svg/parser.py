@@ -18,8 +18,10 @@
 # along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-from typing import Dict, List
+from typing import BinaryIO, Callable, Dict, List
 from xml.sax.handler import ContentHandler
+from xml.sax.saxutils import XMLGenerator
+import re
 import xml.sax
 import xml.parsers.expat
 from itertools import chain
@@ -79,3 +81,92 @@ def parse_svg_groups(file_name: str) -> Dict[str, List[str]]:
     with open(file_name) as svg:
         parser.parse(svg)
     return handler.groups
+
+
+# Elements copied with all their content even if not selected
+SHARED_ELEMENTS = {'defs', 'style'}
+
+NAME_PATTERN = re.compile(r'[^A-Za-z0-9_]')
+
+
+def object_name(xml_id: str) -> str:
+    """
+    Name that FreeCAD gives to an object created from the svg id.
+
+    :param str xml_id: svg node id
+    :return str: valid object name
+    """
+    name = NAME_PATTERN.sub('_', xml_id)
+    if name[:1].isdigit():
+        name = '_' + name
+    return name
+
+
+class SelectionFilter(ContentHandler):
+    """
+    Copies the selected elements with their content, the groups containing
+    them (with their transforms and styles) and the shared definitions.
+    Ancestors are buffered and only written once a selected element is
+    found inside them.
+    """
+
+    def __init__(self, out: BinaryIO, keep: Callable[[str], bool]):
+        self.writer = XMLGenerator(out, encoding='utf-8', short_empty_elements=True)
+        self.keep = keep
+        self.stack = []  # [name, attrs, written]
+        self.inside = None  # depth of the selected element being copied
+        self.elements = 0
+        self.selected = 0
+
+    def startDocument(self):
+        self.writer.startDocument()
+
+    def endDocument(self):
+        self.writer.endDocument()
+
+    def startElement(self, name, attrs):
+        self.elements += 1
+        self.stack.append([name, attrs, False])
+        if self.inside is None:
+            xml_id = attrs.get('id', None)
+            if name.rsplit(':', 1)[-1] in SHARED_ELEMENTS or (xml_id and (self.keep(xml_id) or self.keep(object_name(xml_id)))):
+                self.inside = len(self.stack)
+                self.selected += 1
+            elif len(self.stack) > 1:
+                return
+        for entry in self.stack:
+            if not entry[2]:
+                self.writer.startElement(entry[0], entry[1])
+                entry[2] = True
+
+    def endElement(self, name):
+        _, _, written = self.stack.pop()
+        if written:
+            self.writer.endElement(name)
+        if self.inside is not None and len(self.stack) < self.inside:
+            self.inside = None
+
+    def characters(self, content):
+        if self.inside is not None:
+            self.writer.characters(content)
+
+    def ignorableWhitespace(self, content):
+        self.characters(content)
+
+
+def filter_svg(file_name: str, keep: Callable[[str], bool], out: BinaryIO) -> SelectionFilter:
+    """
+    Write a reduced copy of the SVG file with only the elements whose id
+    (or object name) is accepted by keep.
+
+    :param str file_name: svg file path
+    :param Callable[[str], bool] keep: id predicate
+    :param BinaryIO out: destination
+    :return SelectionFilter: the handler, with element counts
+    """
+    parser = xml.sax.make_parser()
+    handler = SelectionFilter(out, keep)
+    parser.setContentHandler(handler)
+    with open(file_name, 'rb') as svg:
+        parser.parse(svg)
+    return handler
@@ -18,20 +18,20 @@
 # along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-import re
-from contextlib import suppress
+import hashlib, re
 from itertools import count
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Callable, Dict, Iterable, List, Tuple
 
 import FreeCAD as App  # type: ignore
 import FreeCADGui as Gui  # type: ignore
-import importSVG as svg  # type: ignore
 import Part  # type: ignore
 import PySide.QtCore as QtCore  # type: ignore
 import PySide.QtGui as QtGui  # type: ignore
 
 from freecad.mnesarco.utils.extension import def_log
+from freecad.mnesarco.utils.timers import execute_later
+from .import_cache import SvgImport, import_cache
 from freecad.mnesarco.vendor.fpo import (
     PropertyBool,
     PropertyFile,
@@ -43,39 +43,169 @@ from freecad.mnesarco.vendor.fpo import (
     Preference
 )
 
-log_err = def_log('SvgFile')
+log = log_err = def_log('SvgFile')
 
 # Preferences
 default_import_as_sketch = Preference(group="MnesarcoUtils/Svg", name="Import as Sketch", default=False)
+debug_stats = Preference(group="MnesarcoUtils/Svg", name="Debug stats", default=False)
 
 SELECTOR_PATTERN = re.compile(r'((?P<name>\w+)\s*:\s*)?\s*(?P<pat>.*)')
 WORD_PATTERN = re.compile(r'\w+')
+LITERAL_PATTERN = re.compile(r'[\w-]+')
+BACKREF_PATTERN = re.compile(r'\\\d|\(\?P=')
+MATCH_ALL_PATTERN = re.compile(r'\(?\.[*+]\)?')
 
-def select(pattern: re.Pattern, doc: App.Document) -> List[Part.Shape]:
+# Object names given by importSVG to elements without svg id
+GENERATED_NAMES = ('Path', 'Face', 'Unnamed', 'Rectangle', 'Circle', 'Ellipse', 'Line', 'Polyline', 'Polygon')
+GENERATED_NAME_PATTERN = re.compile(f"({'|'.join(GENERATED_NAMES)})\\d*")
+GENERATED_NAME_SAMPLES = [f'{base}{n}' for base in GENERATED_NAMES for n in ('', '001', '042')]
+
+# Hidden property of the children with the hash of their imported geometry
+FINGERPRINT_PROPERTY = 'SvgFingerprint'
+
+# Executions avoided by collecting property changes
+saved_executions = 0
+
+
+def stats() -> Dict[str, int]:
+    """Import cache counters and executions avoided so far"""
+    return {**import_cache.stats(), 'saved_executions': saved_executions}
+
+
+def literal_ids(raw_pattern: str) -> List[str] | None:
+    """
+    Ids of a selector made only of exact ids.
+
+    :param str raw_pattern: selector pattern as written by the user
+    :return List[str] | None: the ids, or None if the selector is a regex
+    """
+    ids = [v.strip() for v in raw_pattern.split(',')]
+    if all(LITERAL_PATTERN.fullmatch(v) for v in ids):
+        return ids
+    return None
+
+
+def combine_patterns(patterns: List[re.Pattern]) -> re.Pattern | None:
     """
-    Extracts objects from the imported svg document using pattern to match ids.
+    Join patterns into one regex with a named group per pattern, in order.
 
-    :param str pattern: regex to match svg node ids.
-    :param App.Document doc: Source document.
-    :return List[Part.Shape | App.DocumentObject]: all matching objects.
+    :param List[re.Pattern] patterns: patterns to join
+    :return re.Pattern | None: combined regex, or None if they can't be combined
     """
-    result = []
-    for obj in doc.Objects:
-        if pattern.fullmatch(obj.Name) and hasattr(obj, 'Shape') and obj.Shape:
-            result.append(obj.Shape.copy())
+    # Numbered backreferences would point to other groups once combined
+    if any(BACKREF_PATTERN.search(p.pattern) for p in patterns):
+        return None
+    try:
+        return re.compile("|".join(f'(?P<_s{i}>{p.pattern})' for i, p in enumerate(patterns)))
+    except re.error:
+        return None
+
+
+def select_all(selection: List[Tuple[str, re.Pattern, str]], shapes: Dict[str, Part.Shape]) -> List[List[Part.Shape]]:
+    """
+    Extracts shapes for all selectors in a single pass over the imported shapes.
+    Exact ids are looked up directly, the other ids are prefiltered with one
+    combined regex that also tells the first selector that matches.
+
+    :param List[Tuple[str, re.Pattern, str]] selection: parsed selectors
+    :param Dict[str, Part.Shape] shapes: Imported shapes by object name.
+    :return List[List[Part.Shape]]: matching shapes of each selector.
+    """
+    result = [[] for _ in selection]
+    patterns = []
+    for index, (_, pattern, raw_pattern) in enumerate(selection):
+        ids = literal_ids(raw_pattern)
+        if ids is None:
+            patterns.append((index, pattern))
+        else:
+            result[index].extend(shapes[i].copy() for i in ids if i in shapes)
+
+    if not patterns:
+        return result
+
+    combined = combine_patterns([p for _, p in patterns])
+    if combined:
+        first_of_group = {combined.groupindex[f'_s{i}']: i for i in range(len(patterns))}
+    for obj_name, shape in shapes.items():
+        first = 0
+        if combined:
+            match = combined.fullmatch(obj_name)
+            if not match:
+                continue
+            first = first_of_group.get(match.lastindex, 0)
+        for index, pattern in patterns[first:]:
+            if pattern.fullmatch(obj_name):
+                result[index].append(shape.copy())
     return result
 
 
-def upsert(shape: Part.Shape, name: str, doc: App.Document, parent: App.DocumentObject, as_sketch: bool) -> App.DocumentObject:
+def selection_matcher(selection: List[Tuple[str, re.Pattern, str]]) -> Callable[[str], bool] | None:
     """
-    Insert or update Object's Shape.
+    Predicate of the ids matched by any selector.
+
+    :param List[Tuple[str, re.Pattern, str]] selection: parsed selectors
+    :return Callable[[str], bool] | None: the predicate, or None if the whole file must be imported
+    """
+    ids = set()
+    patterns = []
+    for _, pattern, raw_pattern in selection:
+        literal = literal_ids(raw_pattern)
+        if literal is not None:
+            # Generated names have no svg id to find in the prefilter
+            if any(GENERATED_NAME_PATTERN.fullmatch(i) for i in literal):
+                return None
+            ids.update(literal)
+        elif MATCH_ALL_PATTERN.fullmatch(pattern.pattern) or any(pattern.fullmatch(n) for n in GENERATED_NAME_SAMPLES):
+            return None
+        else:
+            patterns.append(pattern)
+
+    combined = combine_patterns(patterns) if patterns else None
+
+    def matches(xml_id: str) -> bool:
+        if xml_id in ids:
+            return True
+        if combined:
+            return combined.fullmatch(xml_id) is not None
+        return any(p.fullmatch(xml_id) for p in patterns)
+
+    return matches
+
+
+def fingerprint(shape: Part.Shape) -> str:
+    """
+    Hash of the shape geometry, exported as BREP.
+
+    :param Part.Shape shape: imported shape
+    :return str: sha256 hex digest
+    """
+    return hashlib.sha256(shape.exportBrepToString().encode()).hexdigest()
+
+
+def set_fingerprint(obj: App.DocumentObject, digest: str) -> None:
+    if FINGERPRINT_PROPERTY not in obj.PropertiesList:
+        obj.addProperty('App::PropertyString', FINGERPRINT_PROPERTY, 'SvgFile', 'Fingerprint of the imported geometry')
+        obj.setEditorMode(FINGERPRINT_PROPERTY, 2)
+    setattr(obj, FINGERPRINT_PROPERTY, digest)
+
+
+def upsert(shape: Part.Shape, name: str, doc: App.Document, parent: App.DocumentObject, as_sketch: bool) -> Tuple[App.DocumentObject, bool]:
+    """
+    Insert or update Object's Shape. Objects whose geometry fingerprint did
+    not change are left untouched.
 
     :param Part.Shape shape: The new Shape
     :param str name: Target object name
     :param App.Document doc: target document
-    :return App.DocumentObject: updated or created object.
+    :return Tuple[App.DocumentObject, bool]: updated or created object, and if it changed.
     """
     obj = doc.getObject(name)
+    digest = fingerprint(shape)
+    if obj and hasattr(obj, 'delGeometries') == as_sketch and getattr(obj, FINGERPRINT_PROPERTY, None) == digest:
+        if not obj.getParent():
+            parent.addObject(obj)
+        return obj, False
+
     if as_sketch:
         import Draft  # type: ignore
         if obj:
@@ -99,7 +229,8 @@ def upsert(shape: Part.Shape, name: str, doc: App.Document, parent: App.Document
         obj.Shape = shape
         if not obj.getParent():
             parent.addObject(obj)
-    return obj
+    set_fingerprint(obj, digest)
+    return obj, True
 
 
 def parse_selector(name: str|None, pattern: str|None, id_prefix: str, id_gen: count) -> Tuple[str, re.Pattern, str] | None:
@@ -201,8 +332,38 @@ class SvgFile:
 
 
     def on_change(self, obj, prop_name, value, old):
-        if prop_name != 'SourceFile' and prop_name != 'Shape':
+        if prop_name != 'SourceFile' and prop_name != 'Shape' and not getattr(self, '_executing', False):
+            self.schedule_execute(obj)
+
+
+    def schedule_execute(self, obj):
+        """
+        Collect changes into one execution in the next event loop iteration,
+        or in the next recompute if it comes first.
+        """
+        global saved_executions
+        if getattr(self, '_pending', False):
+            saved_executions += 1
+            return
+        self._pending = True
+        execute_later(lambda: self.execute_pending(obj))
+
+
+    def execute_pending(self, obj):
+        global saved_executions
+        if not getattr(self, '_pending', False):
+            saved_executions += 1
+            return
+        try:
+            alive = obj.Document.getObject(obj.Name) is not None
+        except Exception:
+            alive = False
+        if alive:
             self.on_execute(obj)
+            if debug_stats():
+                log(f"{obj.Label} rebuilt: {stats()}")
+        else:
+            self._pending = False
 
 
     def get_selection(self, obj: App.DocumentObject) -> Tuple[List[Tuple[str, re.Pattern, str]], str]:
@@ -223,85 +384,112 @@ class SvgFile:
         return result, error
 
 
-    def extract_by_pattern(self, selection, not_found, new_children, svg_doc):
-        for name, pattern, raw_pattern in selection:
-            shapes = select(pattern, svg_doc)
+    def extract_by_pattern(self, selection, not_found, new_children, svg_import: SvgImport):
+        for (name, _, raw_pattern), shapes in zip(selection, select_all(selection, svg_import.shapes)):
             if shapes:
                 new_children.append((Part.makeCompound(shapes), name))
             else:
                 not_found.append((name, raw_pattern))
 
 
-    def extract_by_group(self, not_found, new_children, svg_doc):
-        from .parser import parse_svg_groups
-        groups = parse_svg_groups(self.file)
-        if groups:
-            for name, xml_id in not_found:
-                group = groups.get(xml_id, None)
-                if group:
-                    shapes = []
-                    for obj_id in group.get_ids():
-                        child = svg_doc.getObject(obj_id)
-                        if child and hasattr(child, 'Shape') and child.Shape:
-                            shapes.append(child.Shape.copy())
-                    if shapes:
-                        new_children.append((Part.makeCompound(shapes), name))
-                    else:
-                        log_err(f"Empty group: {name}: {xml_id}")
+    def extract_by_group(self, not_found, new_children, svg_import: SvgImport):
+        """Returns error messages of the selections still missing"""
+        missing = []
+        groups = svg_import.groups(self.file)
+        for name, xml_id in not_found:
+            group = groups.get(xml_id, None) if groups else None
+            if group:
+                shapes = []
+                for obj_id in group.get_ids():
+                    shape = svg_import.shapes.get(obj_id, None)
+                    if shape:
+                        shapes.append(shape.copy())
+                if shapes:
+                    new_children.append((Part.makeCompound(shapes), name))
                 else:
-                    log_err(f"Group not found: {name}: {xml_id}")
+                    missing.append(f"Empty group: {name}: {xml_id}")
+            else:
+                missing.append(f"Group not found: {name}: {xml_id}")
+        return missing
+
+
+    def extract(self, selection, svg_import: SvgImport):
+        """Returns (new_children, missing)"""
+        # Extract objects by id pattern
+        new_children = []
+        not_found = []
+        self.extract_by_pattern(selection, not_found, new_children, svg_import)
+
+        # Extract object not_found, looking for groups
+        missing = []
+        if not_found:
+            missing = self.extract_by_group(not_found, new_children, svg_import)
+        return new_children, missing
 
 
     def on_execute(self, obj):
+        self._pending = False
+        self._executing = True
+        try:
+            self.rebuild(obj)
+        finally:
+            self._executing = False
+
+
+    def rebuild(self, obj):
         selection, selection_error = self.get_selection(obj)
         if selection_error:
             log_err(selection_error)
             return
 
         if self.file and Path(self.file).exists() and self.select:
-            doc_name = App.ActiveDocument.Name
+            # Rebuilds run deferred, the active document may be another one by now
+            doc = obj.Document
+            active = App.ActiveDocument
 
             # save objects names for removal
             pending_for_remove = dict()
             if obj.Group:
                 pending_for_remove = {c.Name: True for c in obj.Group}
 
-            # Load svg file into a temporal document
-            svg_doc: App.Document = App.newDocument('_svg_import_', hidden=True, temp=True)
-            svg_doc_name = svg_doc.Name
-            svg.insert(self.file, svg_doc.Name)
+            # Load svg file, reused while its content and import settings do not change.
+            # Only the selected elements are imported, unless a selector matches everything.
+            keep_key = "\n".join(raw_pattern for _, _, raw_pattern in selection)
+            matcher = selection_matcher(selection)
+            svg_import = import_cache.get(self.file, matcher, keep_key)
+            new_children, missing = self.extract(selection, svg_import)
 
-            # Extract objects by id pattern
-            new_children = []
-            not_found = []
-            self.extract_by_pattern(selection, not_found, new_children, svg_doc)
+            # Elements that the prefilter could not see (i.e. without svg id)
+            # need the whole file, never remove children because of the prefilter
+            if missing and matcher is not None:
+                svg_import = import_cache.get(self.file)
+                new_children, missing = self.extract(selection, svg_import)
 
-            # Extract object not_found, looking for groups
-            if not_found:
-                self.extract_by_group(not_found, new_children, svg_doc)
+            for error in missing:
+                log_err(error)
 
-            # Clean hidden import file
-            with suppress(Exception):
-                App.closeDocument(svg_doc_name)
+            # The hidden import document may have taken the active document
+            if active:
+                App.setActiveDocument(active.Name)
 
-            # Insert targets into current doc
-            App.setActiveDocument(doc_name)
+            # Insert targets into the document of obj
             updated_objects = []
             for shape, name in new_children:
-                child = upsert(shape, name, App.ActiveDocument, obj, self.as_sketches)
+                child, changed = upsert(shape, name, doc, obj, self.as_sketches)
                 pending_for_remove[child.Name] = False
-                updated_objects.append(child)
+                if changed:
+                    updated_objects.append(child)
 
             # Clean orphan objects
             for name, remove in pending_for_remove.items():
-                if remove and App.ActiveDocument.getObject(name):
-                    App.ActiveDocument.removeObject(name)
+                if remove and doc.getObject(name):
+                    doc.removeObject(name)
 
-            # Clear recompute
+            # Clear recompute, unchanged children keep their state
             for child in updated_objects:
                 child.recompute()
                 child.purgeTouched()
 
             # Restore selection
             Gui.Selection.clearSelection()
-            Gui.Selection.addSelection(App.ActiveDocument.Name, obj.Name)
+            Gui.Selection.addSelection(doc.Name, obj.Name)
@@ -18,6 +18,7 @@
 # along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
 # 
 
+import tempfile
 from pathlib import Path
 
 
@@ -31,3 +32,15 @@ def resolve_path(file, reference_file):
 
 def make_path_relative(path, reference_path):
     return Path(path).relative_to(Path(reference_path).parent)
+
+
+def user_cache_dir(*parts):
+    """Returns a directory for cached data of this extension, creating it if required"""
+    from freecad.mnesarco import App
+    try:
+        base = App.getUserCachePath()
+    except AttributeError:
+        base = tempfile.gettempdir()
+    path = Path(base).joinpath('MnesarcoUtils', *parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
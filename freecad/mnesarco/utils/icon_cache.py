@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+# 
+# Copyright (C) 2021 Frank David Martinez M. <https://github.com/mnesarco/>
+# 
+# This file is part of Mnesarco Utils.
+# 
+# Mnesarco Utils is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# Utils is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with Mnesarco Utils.  If not, see <http://www.gnu.org/licenses/>.
+# 
+
+import hashlib, os, re, threading
+from collections import OrderedDict
+from pathlib import Path
+from freecad.mnesarco.utils.qt import QtGui, QtCore
+from freecad.mnesarco.utils.files import user_cache_dir
+
+# Max bytes on disk before least recently used icons are removed
+CACHE_LIMIT = 32 * 1024 * 1024
+
+PIXMAP_PATTERN = re.compile(r'"([^"]*)"')
+
+
+def image_to_png(image):
+    data = QtCore.QByteArray()
+    buffer = QtCore.QBuffer(data)
+    buffer.open(QtCore.QIODevice.WriteOnly)
+    image.save(buffer, 'PNG')
+    buffer.close()
+    return bytes(data.data())
+
+
+class IconCache:
+    """
+    On-disk png cache of rendered icons.
+
+    Files are named by the hash of their content and their pixel size, so the
+    same icon used by several workbenches is stored once and a changed icon
+    (e.g. after a theme change) gets a new file. Renders are memoized in
+    memory by source identity, and the directory is kept under `limit` bytes
+    by removing the least recently used files. Files reported by `in_use`
+    (i.e. still served by cached pages) are never removed.
+    """
+
+    def __init__(self, root=None, limit=CACHE_LIMIT):
+        self.root = Path(root) if root else None
+        self.limit = limit
+        self.lock = threading.RLock()
+        self.files = OrderedDict()  # name -> bytes, in LRU order
+        self.total = 0
+        self.memo = {}  # key -> name
+        self.memo_keys = {}  # name -> keys
+        self.in_use = None
+        self.loaded = False
+
+    def set_in_use(self, paths):
+        """paths() returns the set of png paths that must not be evicted"""
+        self.in_use = paths
+
+    def load(self):
+        """Index files left by previous sessions, oldest first"""
+        if self.loaded:
+            return
+        self.loaded = True
+        if self.root is None:
+            self.root = user_cache_dir('icons')
+        self.root.mkdir(parents=True, exist_ok=True)
+        entries = []
+        with os.scandir(self.root) as it:
+            for e in it:
+                if e.is_file() and e.name.endswith('.png'):
+                    st = e.stat()
+                    entries.append((st.st_mtime, e.name, st.st_size))
+        for _, name, size in sorted(entries):
+            self.files[name] = size
+            self.total += size
+
+    def lookup(self, key):
+        name = self.memo.get(key, None)
+        if name and name in self.files:
+            self.files.move_to_end(name)
+            return str(self.root.joinpath(name))
+
+    def store(self, key, image, size):
+        """Write image as png named by content hash and size"""
+        if image is None or image.isNull():
+            return None
+        png = image_to_png(image)
+        name = '{}-{}.png'.format(hashlib.sha1(png).hexdigest()[:24], size)
+        path = self.root.joinpath(name)
+        if name not in self.files:
+            tmp = path.with_suffix('.tmp')
+            tmp.write_bytes(png)
+            os.replace(tmp, path)
+            self.files[name] = len(png)
+            self.total += len(png)
+        else:
+            self.files.move_to_end(name)
+        self.memo[key] = name
+        self.memo_keys.setdefault(name, set()).add(key)
+        return str(path)
+
+    def evict(self):
+        if self.total <= self.limit:
+            return
+        in_use = self.in_use() if self.in_use else ()
+        for name in list(self.files):
+            if self.total <= self.limit or len(self.files) <= 1:
+                break
+            path = self.root.joinpath(name)
+            if str(path) in in_use:
+                continue
+            self.total -= self.files.pop(name)
+            for key in self.memo_keys.pop(name, ()):
+                self.memo.pop(key, None)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def render(self, key, size, make_image):
+        with self.lock:
+            self.load()
+            path = self.lookup(key)
+            if path:
+                return path
+            path = self.store(key, make_image(), size)
+            self.evict()
+            return path
+
+    def qicon(self, icon, size, scale=1):
+        """Png path of a QIcon rendered at size * scale pixels"""
+        px = int(size * scale)
+        key = ('qicon', icon.cacheKey(), px)
+        return self.render(key, px, lambda: icon.pixmap(px, px).toImage())
+
+    def action(self, action, size, scale=1):
+        return self.qicon(action.icon(), size, scale)
+
+    def actions(self, actions, size, scales=(1,)):
+        """Batch extraction: for each action, a dict of scale -> png path"""
+        with self.lock:
+            return [{s: self.action(a, size, s) for s in scales} for a in actions]
+
+    def xpm(self, xpm, size=None):
+        """Png path of an inline XPM icon"""
+        digest = hashlib.sha1(xpm.encode()).hexdigest()
+        key = ('xpm', digest, size)
+        def make_image():
+            image = QtGui.QPixmap(PIXMAP_PATTERN.findall(xpm)).toImage()
+            if size and not image.isNull():
+                image = image.scaled(size, size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+            return image
+        return self.render(key, size or 0, make_image)
+
+    def file(self, path, size, scale=1):
+        """
+        Png path of an image file or Qt resource rendered at size * scale.
+        Svg files are returned as they are, browsers scale them.
+        """
+        path = str(path)
+        if path.lower().endswith('.svg') and os.path.isfile(path):
+            return path
+        px = int(size * scale)
+        try:
+            st = os.stat(path)
+            version = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            version = None
+        key = ('file', path, version, px)
+        return self.render(key, px, lambda: QtGui.QIcon(path).pixmap(px, px).toImage())
+
+    def stats(self):
+        with self.lock:
+            return {'files': len(self.files), 'bytes': self.total, 'limit': self.limit, 'memo': len(self.memo)}
+
+
+icon_cache = IconCache()
@@ -52,6 +52,9 @@ def get_user_pref(*path, kind=str, default=None, root="BaseApp"):
     group = App.ParamGet(group_key)
     try:
         if kind == bool:
+            # GetBool(key) is False for missing keys, pass bool defaults through
+            if isinstance(default, bool):
+                return group.GetBool(key, default)
             v = group.GetBool(key)
             return default if v is None else v
         elif kind == int:
@@ -20,14 +20,17 @@
 
 from PySide import QtGui, QtCore
 from freecad.mnesarco.resources import Icons
-import re
-import tempfile
-from pathlib import Path
-import hashlib
 
-Qt = QtCore.Qt
+try:
+    from shiboken2 import isValid as is_alive
+except ImportError:
+    try:
+        from shiboken6 import isValid as is_alive
+    except ImportError:
+        def is_alive(obj):
+            return True
 
-PIXMAP_PATTERN = re.compile(r'"([^"]*)"')
+Qt = QtCore.Qt
 
 def BasicQIcon(path):
     qicon = QtGui.QIcon()
@@ -44,32 +47,17 @@ def BasicListItem(text, icon=None, data=None, editable=False):
     return item
 
 
-def pixmap_to_png(xpm):
-    name = '{0}.png'.format(hashlib.md5(xpm.encode()).hexdigest())
-    tmp = Path(tempfile.gettempdir()).joinpath(name)
-    if tmp.exists():
-        return str(tmp)
-    else:
-        tmp = str(tmp)
-        data = PIXMAP_PATTERN.findall(xpm)
-        pixmap = QtGui.QPixmap(data)
-        pixmap.save(tmp, 'PNG')
-        return tmp
+def pixmap_to_png(xpm, size=None):
+    from freecad.mnesarco.utils.icon_cache import icon_cache
+    return icon_cache.xpm(xpm, size)
 
 
 def extract_action_pixmap(action, size):
-    name = '{0}.png'.format(action.objectName())
-    tmp = Path(tempfile.gettempdir()).joinpath(name)
-    if tmp.exists():
-        return str(tmp)
-    else:
-        tmp = str(tmp)
-        try:
-            pixmap = action.icon().pixmap(size)
-            pixmap.save(tmp, 'PNG')
-            return tmp
-        except BaseException:
-            return None
+    from freecad.mnesarco.utils.icon_cache import icon_cache
+    try:
+        return icon_cache.action(action, size)
+    except BaseException:
+        return None
 
 class SignalObject(QtCore.QObject):
 